@@ -7,7 +7,7 @@ from rest_framework.utils.urls import replace_query_param
 
 from apps.frontpage.models import FrontpageStory
 from apps.stories.models import Story
-from utils.serializers import CropBoxField
+from utils.serializers import CropBoxField, MemoizedListSerializer
 
 from .photos import ImageFile, ImageFileSerializer
 
@@ -83,6 +83,8 @@ class FrontpageStorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = FrontpageStory
+        list_serializer_class = MemoizedListSerializer
+        prefetch_memoized = ['imagefile.large_url']
         fields = [
             'id',
             'url',
@@ -162,11 +164,10 @@ class FrontpageStoryViewset(viewsets.ModelViewSet):
         if sections:
             stories = stories.filter(story_type__section__in=sections)
         if search:
-            stories = stories.search(search)
-            pks = list(stories.values_list('frontpagestory', flat=True)[:100])
+            pks = stories.search_ids(search, 100)
             order = Case(
-                *[When(pk=pk, then=pos) for pos, pk in enumerate(pks)]
+                *[When(story=pk, then=pos) for pos, pk in enumerate(pks)]
             )
-            return self.queryset.filter(pk__in=pks).order_by(order)
+            return self.queryset.filter(story__in=pks).order_by(order)
         else:
             return self.queryset.filter(story__in=stories)
@@ -0,0 +1,28 @@
+"""Most read stories"""
+
+from rest_framework import exceptions, permissions, response, views
+
+from apps.stories.most_read import WINDOWS, most_read
+
+MAX_LIMIT = 50
+
+
+class MostReadAPIView(views.APIView):
+    """Most read stories in the last hour, day or week. Served from redis."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, format=None):
+        window = request.query_params.get('window', '24h')
+        if window not in WINDOWS:
+            raise exceptions.ValidationError(
+                {'window': f'must be one of {", ".join(WINDOWS)}'}
+            )
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            raise exceptions.ValidationError({'limit': 'must be a number'})
+        limit = max(1, min(limit, MAX_LIMIT))
+        return response.Response({
+            'window': window,
+            'results': most_read(window, limit),
+        })
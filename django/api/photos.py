@@ -11,7 +11,11 @@ from url_filter.integrations.drf import DjangoFilterBackend
 from apps.contributors.models import Contributor
 from apps.photo.models import ImageFile
 from apps.photo.tasks import upload_imagefile_to_desken
-from utils.serializers import AbsoluteURLField, CropBoxField
+from utils.serializers import (
+    AbsoluteURLField,
+    CropBoxField,
+    MemoizedListSerializer,
+)
 
 logger = logging.getLogger('apps')
 
@@ -19,6 +23,8 @@ logger = logging.getLogger('apps')
 class ImageFileSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = ImageFile
+        list_serializer_class = MemoizedListSerializer
+        prefetch_memoized = ['small_url', 'large_url']
         fields = [
             'id',
             'url',
@@ -56,8 +62,8 @@ class ImageFileSerializer(serializers.HyperlinkedModelSerializer):
     usage = serializers.IntegerField(read_only=True)
     crop_box = CropBoxField()
     original = AbsoluteURLField()
-    small = AbsoluteURLField()
-    large = AbsoluteURLField()
+    small = AbsoluteURLField(source='small_url')
+    large = AbsoluteURLField(source='large_url')
     # thumb = AbsoluteURLField()
     mimetype = serializers.SerializerMethodField()
     method = serializers.SerializerMethodField()
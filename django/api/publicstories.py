@@ -6,7 +6,7 @@ from rest_framework.filters import BaseFilterBackend
 from url_filter.integrations.drf import DjangoFilterBackend
 
 from apps.stories.models import Byline, Story, StoryImage
-from utils.serializers import AbsoluteURLField
+from utils.serializers import AbsoluteURLField, MemoizedListSerializer
 
 from .stories import StorySerializerNested
 
@@ -19,6 +19,13 @@ class PublicStorySerializer(StorySerializerNested):
 
     class Meta(StorySerializerNested.Meta):
         model = Story
+        list_serializer_class = MemoizedListSerializer
+        prefetch_memoized = [
+            'facebook_thumb',
+            'byline_set.contributor.thumb',
+            'images.cropped',
+            'images.large',
+        ]
         fields = StorySerializerNested.Meta.fields + [
             'url',
             'slug',
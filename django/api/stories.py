@@ -2,7 +2,14 @@ import logging
 
 from django.core.exceptions import FieldError
 from django.db.models import Count, Prefetch
-from rest_framework import exceptions, filters, serializers, viewsets
+from rest_framework import (
+    exceptions,
+    filters,
+    pagination,
+    serializers,
+    viewsets,
+)
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from url_filter.integrations.drf import DjangoFilterBackend
 
 from apps.stories.models import (
@@ -16,7 +23,8 @@ from apps.stories.models import (
     StoryType,
     StoryVideo,
 )
-from utils.serializers import AbsoluteURLField
+from apps.stories.models.search_mixin import SEARCH_CANDIDATES
+from utils.serializers import AbsoluteURLField, MemoizedListSerializer
 
 from .storyimages import StoryImageSerializer
 
@@ -80,6 +88,8 @@ class InlineLinkSerializer(serializers.ModelSerializer):
 class BylineSerializer(serializers.ModelSerializer):
     class Meta:
         model = Byline
+        list_serializer_class = MemoizedListSerializer
+        prefetch_memoized = ['contributor.thumb']
         fields = [
             'id',
             'ordering',
@@ -221,21 +231,81 @@ class SearchFilterBackend(filters.BaseFilterBackend):
 
     def filter_queryset(self, request, queryset, view):
         search_query = request.query_params.get('search', None)
+        order_by = request.query_params.get('ordering')
+        if search_query and not order_by:
+            return queryset.search_ranked(search_query)
         if search_query:
             queryset = queryset.search(search_query)
 
-        order_by = request.query_params.get('ordering')
         if order_by:
             return queryset.order_by(order_by)
         else:
             return queryset.order_by('publication_status', '-modified')
 
 
+class SearchCursorPagination(pagination.LimitOffsetPagination):
+    """Keyset pagination of ranked search results, with the position in the
+    cached result list as cursor. Other lists use limit and offset.
+
+    Only the best matches of a search are ranked, so `count` is at most
+    `SEARCH_CANDIDATES`. The response has `count_capped: true` when there
+    might be more matches than that."""
+
+    cursor_query_param = 'after'
+
+    cursor = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if 'search_position' not in queryset.query.annotations:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.limit = self.get_limit(request)
+        try:
+            self.cursor = int(request.query_params[self.cursor_query_param])
+        except (KeyError, ValueError):
+            self.cursor = -1
+        results = list(
+            queryset.filter(search_position__gt=self.cursor)[:self.limit]
+        )
+        self.offset = self.cursor + 1
+        self.count = results[0].search_total if results else 0
+        return results
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.cursor is not None:
+            response.data['count_capped'] = self.count >= SEARCH_CANDIDATES
+        return response
+
+    def get_next_link(self):
+        if self.cursor is None:
+            return super().get_next_link()
+        last = self.offset + self.limit - 1
+        if last + 1 >= self.count:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.cursor_query_param, last)
+
+    def get_previous_link(self):
+        if self.cursor is None:
+            return super().get_previous_link()
+        if self.offset <= 0:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        cursor = self.offset - self.limit - 1
+        if cursor < 0:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+
 class StoryViewSet(QueryOrderableViewSetMixin, viewsets.ModelViewSet):
     """ API endpoint that allows Story to be viewed or updated.  """
 
     filter_backends = [DjangoFilterBackend, SearchFilterBackend]
     filter_fields = ['id', 'publication_status', 'modified']
+    pagination_class = SearchCursorPagination
 
     def is_nested(self):
         return 'nested' in self.request.query_params
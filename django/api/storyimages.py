@@ -2,7 +2,11 @@ from rest_framework import serializers, viewsets
 from url_filter.integrations.drf import DjangoFilterBackend
 
 from apps.stories.models import StoryImage
-from utils.serializers import AbsoluteURLField, CropBoxField
+from utils.serializers import (
+    AbsoluteURLField,
+    CropBoxField,
+    MemoizedListSerializer,
+)
 
 
 class StoryImageSerializer(serializers.ModelSerializer):
@@ -12,7 +16,7 @@ class StoryImageSerializer(serializers.ModelSerializer):
         read_only=True, source='imagefile.filename'
     )
 
-    thumb = AbsoluteURLField(source='imagefile.large.url')
+    thumb = AbsoluteURLField(source='large')
     cropped = AbsoluteURLField(read_only=True)
     aspect_ratio = serializers.DecimalField(
         required=False, max_digits=5, decimal_places=4
@@ -21,6 +25,8 @@ class StoryImageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = StoryImage
+        list_serializer_class = MemoizedListSerializer
+        prefetch_memoized = ['cropped', 'large']
         fields = [
             'url',
             'id',
@@ -0,0 +1,27 @@
+"""Typeahead suggestions"""
+
+from rest_framework import exceptions, permissions, response, views
+
+from apps.contributors.models import name_suggestions
+from apps.stories.models.story import headline_suggestions
+
+MAX_LIMIT = 20
+
+
+class SuggestAPIView(views.APIView):
+    """Stories and contributors with a word starting with the query. Served
+    from redis."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, format=None):
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', 5))
+        except ValueError:
+            raise exceptions.ValidationError({'limit': 'must be a number'})
+        limit = max(1, min(limit, MAX_LIMIT))
+        return response.Response({
+            'query': query,
+            'stories': headline_suggestions.suggest(query, limit),
+            'contributors': name_suggestions.suggest(query, limit),
+        })
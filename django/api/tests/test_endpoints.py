@@ -1,6 +1,8 @@
 import pytest
 from rest_framework import status
 
+from apps.stories.models import Story
+
 endpoints = [
     'contributors',
     'frontpage',
@@ -20,3 +22,17 @@ endpoints = [
 def test_api_endpoint_exists(staff_client, endpoint):
     response = staff_client.get(f'/api/{endpoint}/')
     assert response.status_code == status.HTTP_200_OK
+
+
+def test_story_search_cursor(staff_client):
+    for n in range(3):
+        Story.objects.create(title=f'Studenter {n}', lede='studenter')
+    response = staff_client.get('/api/stories/?search=studenter&limit=2')
+    assert response.data['count'] == 3
+    assert response.data['count_capped'] is False
+    assert len(response.data['results']) == 2
+    assert 'after=1' in response.data['next']
+    response = staff_client.get(response.data['next'])
+    assert len(response.data['results']) == 1
+    assert response.data['next'] is None
+    assert 'after' not in response.data['previous']
@@ -7,12 +7,14 @@ from .contributors import ContributorViewSet, PositionViewSet
 from .frontpage import FrontpageStoryViewset
 from .issues import IssueViewSet, PrintIssueViewSet
 from .legacy_viewsets import ProdStoryViewSet
+from .mostread import MostReadAPIView
 from .permissions import PermissionViewSet
 from .photos import ImageFileViewSet
 from .publicstories import PublicStoryViewSet
 from .site import SiteDataAPIView
 from .stories import StoryTypeViewSet, StoryViewSet
 from .storyimages import StoryImageViewSet
+from .suggest import SuggestAPIView
 from .upload_image import FileUploadViewSet
 
 router = routers.DefaultRouter()
@@ -39,5 +41,7 @@ urlpatterns = [
         include('rest_framework.urls', namespace='rest_framework')
     ),
     url(r'^rest-auth/', include(rest_auth_urls)),
-    url(r'^site/$', SiteDataAPIView.as_view(), name='site-data')
+    url(r'^site/$', SiteDataAPIView.as_view(), name='site-data'),
+    url(r'^mostread/$', MostReadAPIView.as_view(), name='most-read'),
+    url(r'^suggest/$', SuggestAPIView.as_view(), name='suggest'),
 ]
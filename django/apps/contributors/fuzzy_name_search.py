@@ -1,10 +1,14 @@
+from collections import Counter, defaultdict
 from functools import wraps
 import glob
 import logging
+import math
 import os
 import re
+import threading
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
 from fuzzywuzzy import fuzz
 from slugify import Slugify
@@ -28,10 +32,73 @@ def find_single_item_or_none(fn):
     return wrapper
 
 
+class FuzzyNameIndex:
+    """Trigram inverted index of names.
+
+    Only names sharing enough trigrams with the query are compared with
+    `fuzz.ratio`. An edit changes at most three trigrams, so names that are
+    similar enough always share most of the query's trigrams.
+    """
+
+    def __init__(self, names=()):
+        self.names = {}
+        self.postings = defaultdict(set)
+        for pk, name in names:
+            self.add(pk, name)
+
+    @staticmethod
+    def trigrams(name):
+        padded = f'  {name.lower()} '
+        return {padded[n:n + 3] for n in range(len(padded) - 2)}
+
+    def add(self, pk, name):
+        self.remove(pk)
+        self.names[pk] = name
+        for trigram in self.trigrams(name):
+            self.postings[trigram].add(pk)
+
+    def remove(self, pk):
+        name = self.names.pop(pk, None)
+        if name is not None:
+            for trigram in self.trigrams(name):
+                self.postings[trigram].discard(pk)
+
+    def _shared(self, name):
+        trigrams = self.trigrams(name)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self.postings.get(trigram, ()))
+        return trigrams, shared
+
+    def search(self, name, minimum_ratio=85):
+        """Primary keys of names with fuzz.ratio at least minimum_ratio,
+        best match first."""
+        trigrams, shared = self._shared(name)
+        max_edits = math.ceil(len(name) * (100 - minimum_ratio) / 100)
+        minimum_shared = max(1, len(trigrams) - 3 * max_edits)
+        ratios = (
+            (fuzz.ratio(self.names[pk], name), pk)
+            for pk, count in shared.items() if count >= minimum_shared
+        )
+        return [
+            pk for ratio, pk in sorted(ratios, reverse=True)
+            if ratio >= minimum_ratio
+        ]
+
+    def contained_in(self, text):
+        """Primary keys of names that are substrings of text."""
+        trigrams, shared = self._shared(text)
+        return [pk for pk in shared if self.names[pk] in text]
+
+
 class FuzzyNameSearchMixin:
     """Mixin for Contributor with some long and hacky methods for fuzzy finding
     byline photo image files and for connecting possibly misspelled bylines"""
 
+    # Name indexes for each model, shared by all threads in the process.
+    _name_indexes = {}
+    _name_index_lock = threading.Lock()
+
     @classmethod
     def get_or_create(cls, input_name, initials=''):
         """
@@ -70,15 +137,14 @@ class FuzzyNameSearchMixin:
 
         def fuzzy_search():
             MINIMUM_RATIO = 85
-            candidates = []
-            for contributor in base_query.all():
-                ratio = fuzz.ratio(contributor.display_name, full_name)
-                if ratio >= MINIMUM_RATIO:
-                    # TODO: two contributors with same name.
+            index = cls.name_index()
+            for pk in index.search(full_name, MINIMUM_RATIO):
+                # TODO: two contributors with same name.
+                contributor = base_query.filter(pk=pk).first()
+                if contributor:
                     return contributor
-                if contributor.display_name in full_name:
-                    candidates.append(contributor)
-            return candidates or None
+            contained = index.contained_in(full_name)
+            return list(base_query.filter(pk__in=contained)) or None
 
         # Variuous queries to look for contributor in the database.
         contributor = (
@@ -119,3 +185,43 @@ class FuzzyNameSearchMixin:
             contributor.save()
 
         return (contributor, created)
+
+    @classmethod
+    def _name_index_version_key(cls):
+        return f'{cls._meta.label_lower}:name_index_version'
+
+    @classmethod
+    def name_index(cls):
+        """Fuzzy index of display names. It's built once per process, and
+        rebuilt when names have been changed in another process."""
+        version = cache.get(cls._name_index_version_key(), 0)
+        with cls._name_index_lock:
+            index, index_version = cls._name_indexes.get(cls, (None, None))
+            if index is None or index_version != version:
+                index = FuzzyNameIndex(
+                    cls.objects.values_list('pk', 'display_name')
+                )
+                cls._name_indexes[cls] = index, version
+        return index
+
+    @classmethod
+    def update_name_index(cls, pk, display_name=None):
+        """Update or remove name in the index, and let other processes know
+        that their indexes are stale."""
+        key = cls._name_index_version_key()
+        cache.add(key, 0, timeout=None)
+        try:
+            version = cache.incr(key)
+        except ValueError:  # expired from cache
+            version = None
+        with cls._name_index_lock:
+            index, index_version = cls._name_indexes.get(cls, (None, None))
+            if index is None:
+                return
+            if display_name is None:
+                index.remove(pk)
+            else:
+                index.add(pk, display_name)
+            if version is None or index_version != version - 1:
+                version = None  # missed changes from other processes
+            cls._name_indexes[cls] = index, version
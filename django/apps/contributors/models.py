@@ -16,6 +16,7 @@ from model_utils.models import TimeStampedModel
 
 from utils.dbfuncs import TrigramWordSimilarity
 from utils.decorators import cache_memoize
+from utils.suggest import SuggestIndex
 
 from .fuzzy_name_search import FuzzyNameSearchMixin
 
@@ -24,6 +25,8 @@ MANAGEMENT_GROUP = 'mellomledere'
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
+# Typeahead suggestions for contributor names.
+name_suggestions = SuggestIndex('contributors')
 
 
 def today():
@@ -126,10 +129,18 @@ class Contributor(TimeStampedModel, FuzzyNameSearchMixin, models.Model):
     def name(self):
         return self.display_name or self.initials or 'N. N.'
 
+    def update_name_suggestions(self):
+        name_suggestions.add(
+            self.pk, self.display_name, {
+                'id': self.pk,
+                'display_name': self.display_name,
+            }
+        )
+
     def bylines_count(self):
         return self.byline_set.count()
 
-    @cache_memoize(60 * 5)  # five minutes
+    @cache_memoize(60 * 5, local_timeout=30)  # five minutes
     def thumb(self):
         img = self.byline_photo
         if not img:
@@ -203,7 +214,7 @@ class Contributor(TimeStampedModel, FuzzyNameSearchMixin, models.Model):
             logger.debug('added %s to %s' % (self, groups))
         return True
 
-    @cache_memoize()
+    @cache_memoize(local_timeout=30)
     def position(self):
         stints = self.stint_set.order_by(
             'position__is_management',
@@ -343,3 +354,26 @@ def close_stints(sender, instance, **kwargs):
     previous_status = sender.objects.get(pk=instance.pk).status
     if previous_status == sender.ACTIVE and instance.status == sender.RETIRED:
         instance.stint_set.active().update(end_date=yesterday())
+
+
+@receiver(models.signals.post_init, sender=Contributor)
+def remember_indexed_name(sender, instance, **kwargs):
+    # Deferred fields are not in __dict__, and are not loaded here.
+    name = instance.__dict__.get('display_name') if instance.pk else None
+    instance._indexed_name = name
+
+
+@receiver(models.signals.post_save, sender=Contributor)
+def update_name_indexes(sender, instance, **kwargs):
+    """Only name changes make the name indexes stale."""
+    if instance.display_name == instance._indexed_name:
+        return
+    instance._indexed_name = instance.display_name
+    instance.update_name_suggestions()
+    sender.update_name_index(instance.pk, instance.display_name)
+
+
+@receiver(models.signals.post_delete, sender=Contributor)
+def remove_from_name_indexes(sender, instance, **kwargs):
+    name_suggestions.remove(instance.pk)
+    sender.update_name_index(instance.pk)
@@ -0,0 +1,60 @@
+"""Tests for fuzzy contributor name lookup"""
+
+from django.core.cache import cache
+import pytest
+
+from apps.contributors.fuzzy_name_search import FuzzyNameIndex
+from apps.contributors.models import Contributor
+
+
+def test_fuzzy_name_index():
+    index = FuzzyNameIndex([
+        (1, 'Jane Doe'),
+        (2, 'John Smith'),
+        (3, 'Ola Nordmann'),
+    ])
+    assert index.search('Jane Doe') == [1]
+    assert index.search('Jnae Doe') == [1]
+    assert index.search('Ola Nordman') == [3]
+    assert index.search('Kari Nordmann') == []
+    assert sorted(index.contained_in('Jane Doe John Smith')) == [1, 2]
+
+    index.add(2, 'Johnny Smith')
+    index.remove(1)
+    assert index.search('Jane Doe') == []
+    assert index.search('John Smith') == [2]
+
+
+@pytest.mark.django_db
+def test_get_or_create_uses_name_index():
+    jane = Contributor.objects.create(display_name='Jane Doe')
+    assert jane.pk in Contributor.name_index().names
+
+    contributor, created = Contributor.get_or_create('Jnae Doe')
+    assert contributor == jane
+    assert not created
+
+    # the index is updated when contributors are saved
+    jane.display_name = 'Jane Smith'
+    jane.save()
+    index = Contributor.name_index()
+    assert index.search('Jane Smith') == [jane.pk]
+    contributor, created = Contributor.get_or_create('Jane Dough')
+    assert created
+    assert contributor.pk in Contributor.name_index().names
+
+
+@pytest.mark.django_db
+def test_name_index_version_changes_with_names():
+    jane = Contributor.objects.create(display_name='Jane Doe')
+    version_key = Contributor._name_index_version_key()
+    version = cache.get(version_key)
+
+    jane.aliases = 'Jnae Doe'
+    jane.save()
+    Contributor.objects.get(pk=jane.pk).save()
+    assert cache.get(version_key) == version
+
+    jane.display_name = 'Jane Smith'
+    jane.save()
+    assert cache.get(version_key) == version + 1
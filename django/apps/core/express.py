@@ -1,23 +1,118 @@
 import json
 import logging
+import threading
+import time
 
 from django.conf import settings
 import requests
 
 logger = logging.getLogger(__name__)
 
+# seconds to wait for connection and for response
+EXPRESS_TIMEOUT = (1, 5)
+# max number of keep-alive connections to express per process
+EXPRESS_POOL_SIZE = 10
 
-def express(path, payload):
+
+class CircuitOpen(requests.ConnectionError):
+    """Request not sent, because of repeated errors."""
+
+
+class CircuitBreaker:
+    """Fails fast after `threshold` errors in a row. After `reset_timeout`
+    seconds, a single trial request is allowed through. If it succeeds, the
+    circuit is closed again."""
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at > self.reset_timeout:
+                # half open: let this request through, keep others out
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.error('Express circuit opened')
+                self.opened_at = time.monotonic()
+
+
+class ExpressClient:
+    """Persistent http client with a pool of keep-alive connections."""
+
+    def __init__(
+        self,
+        pool_size=EXPRESS_POOL_SIZE,
+        timeout=EXPRESS_TIMEOUT,
+        breaker=None,
+    ):
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=1,  # only retry failed connections
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def post(self, url, payload):
+        if not self.breaker.allow():
+            raise CircuitOpen(f'Express circuit is open: {url}')
+        start = time.monotonic()
+        try:
+            response = self.session.post(
+                url=url, json=payload, timeout=self.timeout
+            )
+        except (requests.ConnectionError, requests.Timeout):
+            self.breaker.failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+        milliseconds = (time.monotonic() - start) * 1000
+        logger.info(
+            f'express {url} {response.status_code} {milliseconds:.0f}ms'
+        )
+        return response
+
+
+express_client = ExpressClient()
+
+
+def express(path, payload, client=None):
     """Interface to express server"""
-    adapter = requests.adapters.HTTPAdapter(max_retries=8)
-    session = requests.Session()
-    session.mount(settings.EXPRESS_SERVER_URL, adapter)
+    client = client or express_client
     try:
-        response = session.post(
-            url=f'{settings.EXPRESS_SERVER_URL}/{path}',
-            json=payload,
-            timeout=5,
+        response = client.post(
+            f'{settings.EXPRESS_SERVER_URL}/{path}', payload
         )
+    except CircuitOpen as e:
+        logger.warning(f'{e}')
+        return {'state': {}, 'error': f'{e}'}
     except (requests.ConnectionError, requests.Timeout) as e:
         logger.exception('Could not connect to express server')
         return {'state': {}, 'error': f'{e}'}
@@ -0,0 +1,28 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from apps.contributors.models import Contributor, name_suggestions
+from apps.stories.models import Story
+from apps.stories.models.story import headline_suggestions
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild typeahead suggestions for stories and contributors'
+
+    def handle(self, *args, **options):
+        headline_suggestions.clear()
+        stories = Story.objects.published().select_related(
+            'story_type__section'
+        )
+        for story in stories.iterator():
+            story.update_headline_suggestions()
+        self.stdout.write(f'{stories.count()} stories indexed')
+
+        name_suggestions.clear()
+        contributors = Contributor.objects.all()
+        for contributor in contributors.iterator():
+            contributor.update_name_suggestions()
+        self.stdout.write(f'{contributors.count()} contributors indexed')
@@ -0,0 +1,164 @@
+"""Pages cached by nginx, and purging them by surrogate keys.
+
+Responses to anonymous users with a `Surrogate-Key` header are cached by
+nginx. The header lists tags of the model instances in the response. Django
+keeps a redis set of urls for each key, and when an instance changes, its
+urls are refreshed through an internal nginx server that bypasses the cache.
+Stock nginx can't purge by key, so a refresh replaces the cached page.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import re
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django_redis import get_redis_connection
+import requests
+
+from utils.cache_tags import tags_purged
+
+logger = logging.getLogger(__name__)
+
+SURROGATE_KEY = 'Surrogate-Key'
+REFRESH_HEADER = 'X-Cache-Refresh'
+# seconds nginx keeps a page, unless it's purged before then
+NGINX_CACHE_TIMEOUT = 60 * 60
+# pages with more keys are tagged by model instead, and cached shorter
+MAX_SURROGATE_KEYS = 50
+NGINX_SHORT_TIMEOUT = 60
+URLS_PREFIX = 'surrogate:'
+# The browsable api and json share urls, so the api is never cached.
+UNCACHED_PATHS = ('/api/', )
+# Instance and model tags, such as `stories.story:1` or `stories.story`.
+SURROGATE_TAG = re.compile(r'^\w+\.\w+(:\d+)?$')
+# Cached variants of each page, same as the cache key in nginx config.
+VARIANTS = [
+    {'Accept-Encoding': 'gzip'},
+    {'Accept-Encoding': 'identity'},
+    {'Accept-Encoding': 'gzip', 'User-Agent': 'Trident'},
+    {'Accept-Encoding': 'identity', 'User-Agent': 'Trident'},
+]
+
+
+def surrogate_keys(tags):
+    """Value of the surrogate key header for these cache tags, and the
+    timeout for nginx."""
+    keys = {tag for tag in tags if SURROGATE_TAG.match(tag)}
+    timeout = NGINX_CACHE_TIMEOUT
+    if len(keys) > MAX_SURROGATE_KEYS:
+        keys = {key.split(':')[0] for key in keys}
+        timeout = NGINX_SHORT_TIMEOUT
+    return ' '.join(sorted(keys)), timeout
+
+
+def refresh_token():
+    return salted_hmac(__name__, 'refresh').hexdigest()
+
+
+def is_refresh(request):
+    """Is this a request from the purge client, which should not get a
+    stale page."""
+    token = request.META.get('HTTP_X_CACHE_REFRESH')
+    return bool(token) and constant_time_compare(token, refresh_token())
+
+
+class SurrogateUrls:
+    """Redis sets of cached urls by surrogate key"""
+
+    def __init__(self, connection=None):
+        self._connection = connection
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = get_redis_connection()
+        return self._connection
+
+    def add(self, url, keys):
+        pipe = self.connection.pipeline()
+        for key in keys:
+            pipe.sadd(URLS_PREFIX + key, url)
+            pipe.expire(URLS_PREFIX + key, NGINX_CACHE_TIMEOUT)
+        pipe.execute()
+
+    def pop(self, keys):
+        """Urls cached with any of the keys, which are then forgotten."""
+        if not keys:
+            return set()
+        names = [URLS_PREFIX + key for key in keys]
+        pipe = self.connection.pipeline()
+        pipe.sunion(names)
+        pipe.delete(*names)
+        urls, deleted = pipe.execute()
+        return {url.decode() for url in urls}
+
+
+surrogate_urls = SurrogateUrls()
+
+
+class NginxCacheClient:
+    """Refreshes cached pages through the internal nginx server."""
+
+    def __init__(self, base_url=None, timeout=(1, 30), workers=4):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.workers = workers
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+
+    @property
+    def enabled(self):
+        return bool(self.base_url or settings.NGINX_CACHE_URL)
+
+    def refresh(self, url):
+        """Refresh all variants of a cached page. Returns the status code,
+        or None if nginx could not be reached."""
+        url = urlsplit(url)
+        base_url = self.base_url or settings.NGINX_CACHE_URL
+        target = f'{base_url.rstrip("/")}{url.path}'
+        if url.query:
+            target += f'?{url.query}'
+        status_code = None
+        for variant in VARIANTS:
+            headers = {
+                'Host': url.netloc,
+                REFRESH_HEADER: refresh_token(),
+                **variant,
+            }
+            try:
+                response = self.session.get(
+                    target,
+                    headers=headers,
+                    timeout=self.timeout,
+                    allow_redirects=False,
+                )
+                status_code = response.status_code
+            except requests.RequestException as err:
+                logger.warning(f'could not refresh {target}: {err}')
+                return None
+        logger.debug(f'{status_code}: refreshed {target}')
+        return status_code
+
+    def refresh_many(self, urls):
+        """Refresh pages concurrently. Returns number of refreshed pages."""
+        with ThreadPoolExecutor(self.workers) as pool:
+            results = list(pool.map(self.refresh, urls))
+        return len([status for status in results if status is not None])
+
+
+nginx_cache_client = NginxCacheClient()
+
+
+@receiver(tags_purged)
+def purge_nginx_cache(sender, tags, **kwargs):
+    """Refresh pages cached by nginx with any of the purged tags."""
+    if not nginx_cache_client.enabled:
+        return
+    urls = surrogate_urls.pop(tags)
+    if urls:
+        from apps.core.tasks import refresh_nginx_cache
+        refresh_nginx_cache.delay(sorted(urls))
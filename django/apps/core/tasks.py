@@ -0,0 +1,55 @@
+"""Background tasks for server side rendering"""
+
+import logging
+from urllib.parse import urlsplit
+
+from celery import shared_task
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpRequest, QueryDict
+
+from apps.core.nginx_cache import nginx_cache_client
+
+logger = logging.getLogger(__name__)
+
+
+def anonymous_request(url, user_agent=''):
+    """Build a GET request for url, as an anonymous user."""
+    url = urlsplit(url)
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = url.path or '/'
+    request.GET = QueryDict(url.query)
+    request.META.update({
+        'SERVER_NAME': url.hostname or 'localhost',
+        'SERVER_PORT': url.port or (443 if url.scheme == 'https' else 80),
+        'HTTP_HOST': url.netloc,
+        'HTTP_USER_AGENT': user_agent,
+        'HTTP_X_FORWARDED_PROTO': url.scheme,
+        'QUERY_STRING': url.query,
+        'REQUEST_METHOD': 'GET',
+    })
+    request.user = AnonymousUser()
+    request.is_bot = True  # should not count as a visit
+    return request
+
+
+@shared_task
+def refresh_cached_page(url, story=None, user_agent=''):
+    """Render page again and replace the stale version in the cache."""
+    from apps.core.views import server_side_render, ssr_cache_key
+    request = anonymous_request(url, user_agent)
+    cache_key = ssr_cache_key(request, story)
+    try:
+        response = server_side_render(request, story)
+        logger.debug(f'refreshed {cache_key}: {response.status_code}')
+    finally:
+        cache.delete(f'{cache_key}:refresh')
+
+
+@shared_task(ignore_result=True)
+def refresh_nginx_cache(urls):
+    """Replace pages cached by nginx with fresh versions."""
+    refreshed = nginx_cache_client.refresh_many(urls)
+    logger.info(f'refreshed {refreshed} of {len(urls)} pages in nginx cache')
+    return refreshed
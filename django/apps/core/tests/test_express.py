@@ -0,0 +1,75 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+from socketserver import ThreadingMixIn
+import threading
+
+import pytest
+
+from apps.core.express import CircuitBreaker, ExpressClient, express
+
+
+class StubExpressHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        payload = json.loads(self.rfile.read(length))
+        status = 500 if self.path == '/error' else 200
+        body = json.dumps({'path': self.path, 'payload': payload}).encode()
+        self.server.connections.add(self.client_address)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def stub_express(settings):
+    server = StubServer(('127.0.0.1', 0), StubExpressHandler)
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    settings.EXPRESS_SERVER_URL = f'http://{host}:{port}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_express_reuses_connection(stub_express):
+    client = ExpressClient()
+    for n in range(3):
+        response = express('markup', {'n': n}, client=client)
+        assert response == {'path': '/markup', 'payload': {'n': n}}
+    assert len(stub_express.connections) == 1
+
+
+def test_express_circuit_breaker(stub_express):
+    breaker = CircuitBreaker(threshold=2, reset_timeout=60)
+    client = ExpressClient(breaker=breaker)
+    express('error', {}, client=client)
+    express('error', {}, client=client)
+    assert breaker.is_open
+    response = express('markup', {}, client=client)
+    assert 'circuit is open' in response['error']
+
+    # after the reset timeout, a successful request closes the circuit
+    breaker.reset_timeout = 0
+    assert express('markup', {}, client=client)['path'] == '/markup'
+    assert not breaker.is_open
+
+
+def test_express_down(settings):
+    settings.EXPRESS_SERVER_URL = 'http://127.0.0.1:9'
+    breaker = CircuitBreaker(threshold=1)
+    client = ExpressClient(breaker=breaker, timeout=(0.2, 0.2))
+    assert express('markup', {}, client=client)['error']
+    assert breaker.is_open
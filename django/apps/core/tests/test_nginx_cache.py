@@ -0,0 +1,175 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import os
+from socketserver import ThreadingMixIn
+import threading
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django_redis import get_redis_connection
+import pytest
+import requests
+
+from apps.core import tasks, views  # noqa: tracked models are set up here
+from apps.core.nginx_cache import (
+    MAX_SURROGATE_KEYS,
+    NGINX_CACHE_TIMEOUT,
+    NGINX_SHORT_TIMEOUT,
+    REFRESH_HEADER,
+    SURROGATE_KEY,
+    NginxCacheClient,
+    is_refresh,
+    nginx_cache_client,
+    refresh_token,
+    surrogate_keys,
+    surrogate_urls,
+)
+from apps.stories.models import Section, Story
+from utils.surrogate_key_middleware import SurrogateKeyMiddleware
+
+
+class StubNginxHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def stub_nginx():
+    server = StubServer(('127.0.0.1', 0), StubNginxHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    server.url = f'http://{host}:{port}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_surrogate_keys():
+    tags = {'stories.story:1', 'photo.imagefile:2', ':1:cache_memoize:x:1'}
+    assert surrogate_keys(tags) == (
+        'photo.imagefile:2 stories.story:1', NGINX_CACHE_TIMEOUT
+    )
+    tags = {f'stories.story:{n}' for n in range(MAX_SURROGATE_KEYS + 1)}
+    assert surrogate_keys(tags) == ('stories.story', NGINX_SHORT_TIMEOUT)
+
+
+def test_refresh_all_variants(stub_nginx):
+    client = NginxCacheClient(base_url=stub_nginx.url)
+    urls = ['https://universitas.no/', 'https://universitas.no/nyheter/?p=2']
+    assert client.refresh_many(urls) == 2
+    assert len(stub_nginx.requests) == 8
+    paths = {path for path, headers in stub_nginx.requests}
+    assert paths == {'/', '/nyheter/?p=2'}
+    for path, headers in stub_nginx.requests:
+        assert headers['Host'] == 'universitas.no'
+        assert headers[REFRESH_HEADER] == refresh_token()
+
+
+def test_refresh_unreachable():
+    client = NginxCacheClient(base_url='http://127.0.0.1:1', timeout=0.1)
+    assert client.refresh_many(['https://universitas.no/']) == 0
+
+
+def test_is_refresh(rf):
+    assert not is_refresh(rf.get('/'))
+    assert not is_refresh(rf.get('/', HTTP_X_CACHE_REFRESH='nope'))
+    assert is_refresh(rf.get('/', HTTP_X_CACHE_REFRESH=refresh_token()))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_surrogate_keys_purge_urls(rf, monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(nginx_cache_client, 'base_url', 'http://nginx:8080')
+    monkeypatch.setattr(
+        tasks.refresh_nginx_cache, 'delay', lambda urls: refreshed.extend(urls)
+    )
+    section = Section.objects.create(title='Nyheter')
+
+    def view(request):
+        titles = [item.title for item in Section.objects.all()]
+        return HttpResponse(' '.join(titles))
+
+    middleware = SurrogateKeyMiddleware(view)
+    request = rf.get('/seksjoner/')
+    request.user = AnonymousUser()
+    response = middleware(request)
+    key = f'stories.section:{section.pk}'
+    assert response[SURROGATE_KEY] == key
+    assert response['X-Accel-Expires'] == str(NGINX_CACHE_TIMEOUT)
+
+    section.save()
+    assert refreshed == ['http://testserver/seksjoner/']
+    assert surrogate_urls.pop([key]) == set()
+
+
+@pytest.mark.django_db
+def test_no_surrogate_keys_for_users(rf, admin_user):
+    middleware = SurrogateKeyMiddleware(lambda request: HttpResponse())
+    request = rf.get('/')
+    request.user = admin_user
+    assert SURROGATE_KEY not in middleware(request)
+
+
+def test_no_surrogate_keys_for_api(rf):
+    middleware = SurrogateKeyMiddleware(lambda request: HttpResponse())
+    request = rf.get('/api/stories/')
+    request.user = AnonymousUser()
+    response = middleware(request)
+    assert SURROGATE_KEY not in response
+    assert 'X-Accel-Expires' not in response
+
+
+def test_cached_story_visits_are_counted(rf, monkeypatch):
+    story, path = 123456, '/nyheter/123456/story/'
+    monkeypatch.setattr(Story, 'is_repeat_visit', lambda *args: False)
+    redis = get_redis_connection()
+    redis.hdel(Story.VISITS_KEY, story)
+
+    request = rf.get(path)
+    cache_key = views.ssr_cache_key(request, story)
+    page = views.compress_response(HttpResponse('story'))
+    cache.set_many({cache_key: (path, page), f'{cache_key}:fresh': True})
+    middleware = SurrogateKeyMiddleware(
+        lambda request: views.react_frontpage_view(request, story=story)
+    )
+    for n in range(3):
+        request = rf.get(path)
+        request.user = AnonymousUser()
+        response = middleware(request)
+        assert response.content == b'story'
+        # every visit must reach django, so nginx can't cache the page
+        assert response['X-Accel-Expires'] == '0'
+    assert int(redis.hget(Story.VISITS_KEY, story)) == 3
+    cache.delete_many([cache_key, f'{cache_key}:fresh'])
+
+
+@pytest.mark.skipif(
+    not os.environ.get('NGINX_TEST_URL'),
+    reason='needs nginx, see docker-compose.testing.yml',
+)
+def test_local_nginx_container():
+    url = os.environ['NGINX_TEST_URL']
+    headers = {'Accept-Encoding': 'gzip'}
+    requests.get(f'{url}/', headers=headers)
+    response = requests.get(f'{url}/', headers=headers)
+    assert response.headers['X-Cache-Status'] in ('HIT', 'UPDATING')
+    assert SURROGATE_KEY not in response.headers
+
+    client = NginxCacheClient(base_url=url)
+    assert client.refresh(f'{url}/') == 200
+    response = requests.get(f'{url}/', headers=headers)
+    assert response.headers['X-Cache-Status'] == 'HIT'
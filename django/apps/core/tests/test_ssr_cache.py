@@ -0,0 +1,87 @@
+import gzip
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+import pytest
+
+from apps.core import tasks, views
+from utils.cache_tags import cache_tags
+
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        tasks.refresh_cached_page, 'delay',
+        lambda **kwargs: calls.append(kwargs)
+    )
+    return calls
+
+
+def anonymous_get(rf, path):
+    request = rf.get(path)
+    request.user = AnonymousUser()
+    return request
+
+
+@pytest.mark.django_db
+def test_serve_stale_page_and_refresh_once(rf, scheduled):
+    request = anonymous_get(rf, '/nyheter/')
+    cache_key = views.ssr_cache_key(request)
+    cache.delete(f'{cache_key}:refresh')
+
+    page = views.compress_response(HttpResponse('fresh'))
+    cache.set(cache_key, ('/nyheter/', page))
+    cache_tags.set(f'{cache_key}:fresh', True, 60, ['test:nyheter'])
+    response = views.react_frontpage_view(request)
+    assert response.content == b'fresh'
+    assert scheduled == []
+
+    # purged pages are stale
+    cache_tags.purge('test:nyheter')
+    for n in range(3):
+        response = views.react_frontpage_view(anonymous_get(rf, '/nyheter/'))
+        assert response.content == b'fresh'
+        assert response['X-Accel-Expires'] == '0'
+    assert len(scheduled) == 1
+    assert scheduled[0]['url'].endswith('/nyheter/')
+
+
+@pytest.mark.django_db
+def test_refresh_task_releases_lock(monkeypatch):
+    rendered = []
+
+    def fake_render(request, story=None):
+        rendered.append((request.path, story))
+        return HttpResponse('new')
+
+    monkeypatch.setattr(views, 'server_side_render', fake_render)
+    request = tasks.anonymous_request('http://example.com/nyheter/')
+    lock_key = f'{views.ssr_cache_key(request)}:refresh'
+    cache.set(lock_key, True)
+
+    tasks.refresh_cached_page('http://example.com/nyheter/')
+    assert rendered == [('/nyheter/', None)]
+    assert cache.get(lock_key) is None
+
+
+def test_compressed_page_is_sent_as_is(rf):
+    html = '<html>%s</html>' % ('universitas ' * 1000)
+    page = views.compress_response(
+        HttpResponse(html, content_type='text/html; charset=utf-8')
+    )
+    status_code, headers, body = page
+    assert len(body) < len(html) / 10
+
+    request = rf.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+    response = views.decompress_response(request, page)
+    assert response.content == body
+    assert response['Content-Encoding'] == 'gzip'
+    assert response['Content-Type'] == 'text/html; charset=utf-8'
+    assert gzip.decompress(response.content).decode() == html
+
+    request = rf.get('/')
+    response = views.decompress_response(request, page)
+    assert not response.has_header('Content-Encoding')
+    assert response.content.decode() == html
@@ -1,12 +1,14 @@
 """Core views for webpage."""
 
+import gzip
 import json
 import logging
+import re
+import time
 
 from django.conf import settings
 from django.core.cache import cache
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.http import HttpResponse
 from django.shortcuts import redirect, render
 from django.views.generic.base import TemplateView
 
@@ -16,15 +18,42 @@ from api.issues import IssueViewSet
 from api.publicstories import PublicStoryViewSet
 from api.site import SiteDataAPIView
 from api.user import AvatarUserDetailsSerializer
+from apps.contributors.models import Contributor
 from apps.frontpage.models import FrontpageStory
-from apps.issues.models import Issue
-from apps.stories.models import Story
+from apps.issues.models import Issue, PrintIssue
+from apps.photo.models import ImageFile
+from apps.stories.models import (
+    Aside,
+    Byline,
+    InlineHtml,
+    Pullquote,
+    Section,
+    Story,
+    StoryImage,
+    StoryType,
+    StoryVideo,
+)
+from utils.cache_tags import (
+    add_tags,
+    cache_tags,
+    collect_tags,
+    model_tag,
+    track_models,
+)
 from utils.decorators import cache_memoize
 
 from . import express
+from .nginx_cache import SURROGATE_KEY, is_refresh, surrogate_keys
 
 logger = logging.getLogger(__name__)
 
+# Cached pages and payloads are purged when these change.
+track_models(
+    Story, StoryImage, StoryVideo, Pullquote, Aside, InlineHtml, Byline,
+    ImageFile, Contributor, FrontpageStory, Section, StoryType, Issue,
+    PrintIssue,
+)
+
 
 def only_anon(request, *args):
     user_id = 0 if request.user.is_anonymous else request.user.pk
@@ -54,32 +83,27 @@ def fetch_story(request, pk):
     return {'type': 'publicstory/STORY_FETCHED', 'payload': payload}
 
 
-@cache_memoize(timeout=60 * 30, args_rewrite=only_anon)
+@cache_memoize(
+    timeout=60 * 30, args_rewrite=only_anon, lock_timeout=10, tagged=True
+)
 def fetch_newsfeed(request):
+    add_tags(model_tag(FrontpageStory))
     response = FrontpageStoryViewset.as_view({'get': 'list'})(request)
     payload = json.loads(json.dumps(response.data))
     return {'type': 'newsfeed/FEED_FETCHED', 'payload': payload}
 
 
-@receiver(post_save, sender=FrontpageStory)
-def clear_feed_cache(sender, instance, **kwargs):
-    fetch_newsfeed.invalidate_all()
-
-
-@cache_memoize(timeout=60 * 30, args_rewrite=only_anon)
+@cache_memoize(timeout=60 * 30, args_rewrite=only_anon, tagged=True)
 def fetch_issues(request):
+    add_tags(model_tag(Issue), model_tag(PrintIssue))
     response = IssueViewSet.as_view({'get': 'list'})(request)
     payload = json.loads(json.dumps({'issues': response.data.get('results')}))
     return {'type': 'issues/ISSUES_FETCHED', 'payload': payload}
 
 
-@receiver(post_save, sender=Issue)
-def clear_issues_cache(sender, instance, **kwargs):
-    fetch_issues.invalidate_all()
-
-
-@cache_memoize(timeout=60 * 15, args_rewrite=only_anon)
+@cache_memoize(timeout=60 * 15, args_rewrite=only_anon, tagged=True)
 def fetch_site(request):
+    add_tags(model_tag(Issue), model_tag(Section))
     response = SiteDataAPIView.as_view()(request)
     payload = json.loads(json.dumps(response.data))
     return {'type': 'site/SITE_FETCHED', 'payload': payload}
@@ -91,7 +115,7 @@ def fetch_adverts(request):
     return {'type': 'adverts/ADVERTS_FETCH_SUCCESS', 'payload': payload}
 
 
-def get_redux_actions(request, story=None, issues=None):
+def get_redux_actions(request, issues=None):
     """Redux actions to simulate data prefetching server side rendering."""
     actions = [
         fetch_newsfeed(request),
@@ -101,39 +125,118 @@ def get_redux_actions(request, story=None, issues=None):
     ]
     if issues:
         actions.append(fetch_issues(request))
-    if story:
-        actions.append(fetch_story(request, int(story)))
     return actions
 
 
-@receiver(post_save, sender=Story)
-def clear_cached_story_response(sender, instance, **kwargs):
-    cache.delete(f'cached_page_{instance.pk}')
+# Rendered pages are fresh until the timeout, or until purged by a change in
+# the content they are tagged with. After that, they are served stale while
+# they are refreshed in the background, until the hard timeout.
+SSR_FRONTPAGE_TIMEOUT = 10 * 60
+SSR_TIMEOUT = 24 * 60 * 60
+SSR_STALE_TIMEOUT = 7 * 24 * 60 * 60
+SSR_REFRESH_LOCK_TIMEOUT = 60
+# Only these headers are stored with cached pages.
+SSR_CACHED_HEADERS = ['Content-Type', 'Content-Language', SURROGATE_KEY]
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+def ssr_cache_key(request, story=None):
+    is_IE = 'Trident' in request.META.get('HTTP_USER_AGENT', '')
+    return f'ssr:{story or request.path}{"IE" if is_IE else ""}'
+
+
+def compress_response(response):
+    """Status, headers and gzipped body of response, for caching"""
+    headers = [(h, response[h]) for h in SSR_CACHED_HEADERS if h in response]
+    return response.status_code, headers, gzip.compress(response.content)
+
+
+def decompress_response(request, page):
+    """Response from compressed page. The gzipped body is sent as it is
+    when the client accepts it."""
+    status_code, headers, body = page
+    if ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        response = HttpResponse(body, status=status_code)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(body), status=status_code)
+    for header, value in headers:
+        response[header] = value
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def schedule_refresh(request, cache_key, story=None):
+    """Render page again in the background. Only once per cache key."""
+    lock_key = f'{cache_key}:refresh'
+    if cache.add(lock_key, True, SSR_REFRESH_LOCK_TIMEOUT):
+        from apps.core.tasks import refresh_cached_page
+        refresh_cached_page.delay(
+            url=request.build_absolute_uri(),
+            story=story,
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        )
 
 
 def react_frontpage_view(request, section=None, story=None, slug=None):
     """Main view for server side rendered content"""
+    response = cached_or_rendered_page(request, story)
+    if story:
+        # Visits are counted by this view, so nginx must not cache stories.
+        response[SURROGATE_KEY] = ''
+    return response
 
-    is_IE = 'Trident' in request.META.get('HTTP_USER_AGENT', '')
-    cache_key = f'cached_page_{story or request.path}{"IE" if is_IE else ""}'
+
+def cached_or_rendered_page(request, story=None):
+    """Page from the ssr cache, or rendered if it's missing"""
+    cache_key = ssr_cache_key(request, story)
 
     if request.user.is_anonymous and not settings.DEBUG:
-        if story:
+        refresh = is_refresh(request)
+        if (
+            story and not getattr(request, 'is_bot', False) and not refresh
+            and not Story.is_repeat_visit(story, request)
+        ):
             Story.register_visit_in_cache(story)
-        response, path = cache.get(cache_key, (None, None))
-        if response:
+        fresh_key = f'{cache_key}:fresh'
+        cached = cache.get_many([cache_key, fresh_key])
+        path, page = cached.get(cache_key, (None, None))
+        fresh = fresh_key in cached
+        if page and (fresh or not refresh):
             if path != request.path:
                 return redirect(path)
+            response = decompress_response(request, page)
+            if not fresh:
+                schedule_refresh(request, cache_key, story)
+                # nginx should not keep the stale version
+                response['X-Accel-Expires'] = 0
+            elif request.path == '/':
+                response['X-Accel-Expires'] = SSR_FRONTPAGE_TIMEOUT
             logger.debug(f'{cache_key} {request}')
             return response
 
+    return server_side_render(request, story)
+
+
+def server_side_render(request, story=None):
+    """Render page with express. Successful renders are cached."""
+    is_IE = 'Trident' in request.META.get('HTTP_USER_AGENT', '')
     issues = any(request.path.startswith(word) for word in ('/utg', '/pdf'))
-    redux_actions = get_redux_actions(request, story, issues)
+    with collect_tags() as tags:
+        redux_actions = get_redux_actions(request, issues)
+        # The page is purged from nginx by its main content.
+        with collect_tags() as content_tags:
+            if story:
+                redux_actions.append(fetch_story(request, int(story)))
+            else:
+                add_tags(model_tag(FrontpageStory))
+    start = time.monotonic()
     ssr_context = express.react_server_side_render(
         actions=redux_actions,
         url=request.build_absolute_uri(),
         path=request.path,
     )
+    render_time = (time.monotonic() - start) * 1000
     if ssr_context.get('error'):
         logger.debug(json.dumps(ssr_context, indent=2))
 
@@ -154,13 +257,25 @@ def react_frontpage_view(request, section=None, story=None, slug=None):
         context={'ssr': ssr_context, 'IE': is_IE},
         status=status_code,
     )
-
-    if request.user.is_anonymous and status_code == 200:
-        timeout = 120
-        if request.path != '/':
-            timeout *= 60
-        cache.set(cache_key, (response, request.path), timeout)
-
+    keys, nginx_timeout = surrogate_keys(content_tags)
+    # an empty value means that nginx should not cache the response
+    response[SURROGATE_KEY] = '' if ssr_context.get('error') else keys
+
+    if request.user.is_anonymous and not ssr_context.get('error'):
+        cache_key = ssr_cache_key(request, story)
+        if status_code == 200:
+            is_frontpage = request.path == '/'
+            timeout = SSR_FRONTPAGE_TIMEOUT if is_frontpage else SSR_TIMEOUT
+            page = compress_response(response)
+            cache.set(cache_key, (request.path, page), SSR_STALE_TIMEOUT)
+            cache_tags.set(f'{cache_key}:fresh', True, timeout, tags)
+            response['X-Accel-Expires'] = min(timeout, nginx_timeout)
+        else:
+            # the page is gone, so don't serve the stale version
+            cache.delete(cache_key)
+
+    # not included in the cached response
+    response['Server-Timing'] = f'ssr;dur={render_time:.0f}'
     return response
 
 
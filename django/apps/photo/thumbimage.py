@@ -5,6 +5,8 @@ from django.db import models
 from sorl import thumbnail
 from sorl.thumbnail.helpers import ThumbnailError
 
+from utils.decorators import cache_memoize
+
 logger = logging.getLogger(__name__)
 IMGSIZES = [200, 800, 1500]
 
@@ -33,6 +35,14 @@ class ThumbImageFile(models.Model):
     def large(self):
         return self.thumbnail('{2}x{2}'.format(*IMGSIZES), upscale=False)
 
+    @cache_memoize()
+    def small_url(self):
+        return self.small.url
+
+    @cache_memoize()
+    def large_url(self):
+        return self.large.url
+
     @property
     def preview(self):
         """Return thumb of cropped image"""
@@ -0,0 +1,110 @@
+"""Guess the language of stories from common words"""
+
+from collections import Counter
+from multiprocessing import Pool
+import re
+
+from apps.stories.models import Story
+
+LANGUAGE_CORPUS = {
+    'nb': [
+        'du',
+        'og',
+        'med',
+        'om',
+        'en',
+        'et',
+        'han',
+        'hun',
+        'ikke',
+        'fra',
+        'bare',
+        'noe',
+    ],
+    'nn': [
+        'du',
+        'og',
+        'med',
+        'om',
+        'ein',
+        'eit',
+        'han',
+        'ho',
+        'ikkje',
+        'frå',
+        'berre',
+        'noko',
+    ],
+    'en': [
+        'you',
+        'and',
+        'with',
+        'a',
+        'an',
+        'he',
+        'she',
+        'not',
+        'from',
+        'only',
+        'something',
+    ],
+}
+
+# Languages for each common word
+WORD_LANGUAGES = {}
+for language, words in LANGUAGE_CORPUS.items():
+    for word in words:
+        WORD_LANGUAGES.setdefault(word, []).append(language)
+
+WORD = re.compile(r'[a-zøæå]+')
+
+
+def guess_language(text, default=None):
+    """Guess language of input text by using a list of common words in
+    candidate languages. Returns default if no common words are found."""
+    counts = Counter(
+        word for word in WORD.findall(text.lower()) if word in WORD_LANGUAGES
+    )
+    if not counts:
+        return default
+    score = {language: 0 for language in LANGUAGE_CORPUS}
+    for word, count in counts.items():
+        for language in WORD_LANGUAGES[word]:
+            score[language] += count
+    return max(score, key=score.get)
+
+
+def guess_languages(
+    stories=None, batch_size=1000, processes=1, dry_run=False
+):
+    """Guess and update language of stories. Yields (pk, language) of each
+    changed story, and saves changes and search vectors for each batch."""
+    if stories is None:
+        stories = Story.objects.all()
+    stories = stories.only('pk', 'language', 'bodytext_markup').order_by('pk')
+    pool = Pool(processes) if processes > 1 else None
+    mapper = pool.map if pool else map
+    try:
+        last_pk = 0
+        while True:
+            # keyset pagination: each batch is an index range scan
+            batch = list(stories.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            texts = [story.bodytext_markup for story in batch]
+            changed = []
+            for story, language in zip(batch, mapper(guess_language, texts)):
+                if language and language != story.language:
+                    story.language = language
+                    changed.append(story)
+            if changed and not dry_run:
+                Story.objects.bulk_update(changed, ['language'])
+                # the language decides the search vector config
+                Story.objects.filter(pk__in=[story.pk for story in changed]
+                                     ).update_search_vector()
+            for story in changed:
+                yield story.pk, story.language
+    finally:
+        if pool:
+            pool.close()
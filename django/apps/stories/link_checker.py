@@ -0,0 +1,92 @@
+"""Concurrent status checks of inline links"""
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from apps.stories.models import InlineLink
+from apps.stories.models.links import http_status_code
+
+logger = logging.getLogger(__name__)
+
+
+class HostRateLimiter:
+    """Keeps requests to the same host at least `interval` seconds apart."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = {}
+
+    def wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class LinkChecker:
+    """Checks links with a pool of threads. Each thread keeps a requests
+    session, so connections to the same host are reused."""
+
+    def __init__(
+        self,
+        workers=20,
+        host_interval=1.0,
+        timeout=1,
+        batch_size=500,
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.limiter = HostRateLimiter(host_interval)
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def status_code(self, link):
+        if link.linked_story_id:
+            return 'INT'
+        if not link.href:
+            return ''
+        url = InlineLink.validate_url(link.href)
+        if url:
+            self.limiter.wait(urlparse(url).netloc)
+        status_code = http_status_code(
+            url, timeout=self.timeout, session=self.session
+        )
+        logger.debug(f'{status_code}: {url}')
+        return status_code
+
+    def check_links(self, links):
+        """Check links and save changed status codes in batches. Returns the
+        number of changed links."""
+        changed = 0
+        with ThreadPoolExecutor(self.workers) as pool:
+            batch = []
+            for link in links.iterator():
+                batch.append(link)
+                if len(batch) == self.batch_size:
+                    changed += self._check_batch(pool, batch)
+                    batch = []
+            changed += self._check_batch(pool, batch)
+        return changed
+
+    def _check_batch(self, pool, links):
+        updated = []
+        for link, status_code in zip(links, pool.map(self.status_code, links)):
+            if status_code != link.status_code:
+                link.status_code = status_code
+                updated.append(link)
+        InlineLink.objects.bulk_update(updated, ['status_code'])
+        return len(updated)
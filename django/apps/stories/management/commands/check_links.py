@@ -4,6 +4,7 @@ import re
 from django.core.management.base import BaseCommand
 from django.db.models import Count
 
+from apps.stories.link_checker import LinkChecker
 from apps.stories.models import InlineLink
 
 logger = logging.getLogger(__name__)
@@ -38,6 +39,22 @@ class Command(BaseCommand):
             default=1,
             help='Seconds to wait for a http response'
         )
+        parser.add_argument(
+            '--workers',
+            '-w',
+            type=int,
+            dest='workers',
+            default=20,
+            help='Number of concurrent requests'
+        )
+        parser.add_argument(
+            '--host-interval',
+            '-i',
+            type=float,
+            dest='host interval',
+            default=1,
+            help='Minimum seconds between requests to the same host'
+        )
 
     def handle(self, *args, **options):
 
@@ -53,17 +70,21 @@ class Command(BaseCommand):
         else:
             links_to_check = InlineLink.objects.all()
 
-        self._check_links(links_to_check, timeout=options['timeout'])
+        checker = LinkChecker(
+            workers=options['workers'],
+            host_interval=options['host interval'],
+            timeout=options['timeout'],
+        )
+        self._check_links(links_to_check, checker)
 
-    def _check_links(self, links_to_check, timeout):
+    def _check_links(self, links_to_check, checker):
         """ Check and update status code for inline links in articles. """
 
         self.stdout.write('Checking {} links'.format(links_to_check.count()))
 
-        for link in links_to_check:
-            link.check_link(save_if_changed=True, timeout=timeout)
+        changed = checker.check_links(links_to_check.order_by('pk'))
 
-        self.stdout.write('Checked {} links'.format(links_to_check.count()))
+        self.stdout.write('{} links changed status'.format(changed))
         link_statuses = InlineLink.objects.values('status_code').annotate(
             count=Count('status_code')
         )
@@ -1,56 +1,12 @@
 import logging
-import re
+import os
 
 from django.core.management.base import BaseCommand
 
-from apps.stories.models import Story
+from apps.stories.language import guess_languages
 
 logger = logging.getLogger(__name__)
 
-LANGUAGE_CORPUS = {
-    'nb': [
-        'du',
-        'og',
-        'med',
-        'om',
-        'en',
-        'et',
-        'han',
-        'hun',
-        'ikke',
-        'fra',
-        'bare',
-        'noe',
-    ],
-    'nn': [
-        'du',
-        'og',
-        'med',
-        'om',
-        'ein',
-        'eit',
-        'han',
-        'ho',
-        'ikkje',
-        'frå',
-        'berre',
-        'noko',
-    ],
-    'en': [
-        'you',
-        'and',
-        'with',
-        'a',
-        'an',
-        'he',
-        'she',
-        'not',
-        'from',
-        'only',
-        'something',
-    ],
-}
-
 
 class Command(BaseCommand):
     help = 'Assign language to all stories'
@@ -63,38 +19,31 @@ class Command(BaseCommand):
             default=False,
             help='Dry run only'
         )
+        parser.add_argument(
+            '--batch-size',
+            '-b',
+            type=int,
+            dest='batch size',
+            default=1000,
+            help='Number of stories to update in each query'
+        )
+        parser.add_argument(
+            '--processes',
+            '-p',
+            type=int,
+            dest='processes',
+            default=os.cpu_count(),
+            help='Number of worker processes'
+        )
 
     def handle(self, *args, **options):
-
-        dry_run = options['dry run']
-        # stories = Story.objects.order_by('?')[:300]
-        stories = Story.objects.all()
-
-        def assign_language_to(story):
-            """Guess and assign language to input story"""
-            text = story.bodytext_markup
-            language = guess_language(text)
-            if language != story.language and not dry_run:
-                story.language = language
-                story.save()
-            msg = '{pk} {title} ({language})'.format(
-                title=story.title,
-                pk=story.pk,
-                language=story.language,
-            )
-            self.stdout.write(msg)
-
-        def guess_language(text):
-            """Guess language of input text by using a list of common words in
-            candidate languages."""
-            score = {key: 0 for key in LANGUAGE_CORPUS.keys()}
-            words = re.findall(r'[a-zøæå]+', text.lower())
-
-            for word in words:
-                for language, words in LANGUAGE_CORPUS.items():
-                    if word in words:
-                        score[language] += 1
-            return max(score, key=score.get)
-
-        for story in stories:
-            assign_language_to(story)
+        changed = guess_languages(
+            batch_size=options['batch size'],
+            processes=options['processes'],
+            dry_run=options['dry run'],
+        )
+        total = 0
+        for pk, language in changed:
+            self.stdout.write(f'{pk} ({language})')
+            total += 1
+        self.stdout.write(f'{total} stories changed language')
@@ -0,0 +1,46 @@
+import logging
+import os
+
+from django.core.management.base import BaseCommand
+
+from apps.stories.similarity import update_similar_stories
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Find similar stories for all published stories'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--number',
+            '-n',
+            type=int,
+            dest='number',
+            default=5,
+            help='Number of similar stories to store for each story'
+        )
+        parser.add_argument(
+            '--processes',
+            '-p',
+            type=int,
+            dest='processes',
+            default=os.cpu_count(),
+            help='Number of worker processes'
+        )
+        parser.add_argument(
+            '--missing',
+            '-m',
+            action='store_true',
+            dest='missing',
+            default=False,
+            help='Only new or changed stories'
+        )
+
+    def handle(self, *args, **options):
+        total = update_similar_stories(
+            missing=options['missing'],
+            number=options['number'],
+            processes=options['processes'],
+        )
+        self.stdout.write(f'{total} stories updated')
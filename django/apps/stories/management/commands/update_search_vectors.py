@@ -0,0 +1,49 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from apps.stories.models import Story
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild full text search vectors for all stories'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            '-b',
+            type=int,
+            dest='batch size',
+            default=1000,
+            help='Number of stories to update in each query'
+        )
+        parser.add_argument(
+            '--missing',
+            '-m',
+            action='store_true',
+            dest='missing',
+            default=False,
+            help='Only stories without a search vector'
+        )
+
+    def handle(self, *args, **options):
+        stories = Story.objects.order_by('pk')
+        if options['missing']:
+            stories = stories.filter(search_vector=None)
+        batch_size = options['batch size']
+        last_pk = 0
+        total = 0
+        while True:
+            # keyset pagination: each batch is an index range scan
+            pks = list(
+                stories.filter(pk__gt=last_pk
+                               ).values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            total += stories.filter(pk__gte=pks[0], pk__lte=pks[-1]
+                                    ).update_search_vector()
+            last_pk = pks[-1]
+            self.stdout.write(f'{total} stories updated (last id {last_pk})')
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+import apps.stories.models.story
+
+# Copied from the story model when this migration was written, so that the
+# data is always converted the same way.
+HOTNESS_EPOCH = datetime(2015, 1, 1, tzinfo=timezone.utc)
+HOTNESS_LIFETIME = 100  # hours
+
+
+def hotness_offset():
+    hours = (datetime.now(timezone.utc) - HOTNESS_EPOCH).total_seconds() / 3600
+    return hours / HOTNESS_LIFETIME
+
+
+def hot_count_to_hotness(apps, schema_editor):
+    schema_editor.execute(
+        'UPDATE stories_story SET hotness = '
+        'ln(greatest(hot_count, 1)) + %s',
+        [hotness_offset()],
+    )
+
+
+def hotness_to_hot_count(apps, schema_editor):
+    schema_editor.execute(
+        'UPDATE stories_story SET hot_count = '
+        'least(exp(greatest(hotness - %s, -700)), 2147483647)::integer',
+        [hotness_offset()],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0016_auto_20190219_2123'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='hotness',
+            field=models.FloatField(
+                db_index=True,
+                default=apps.stories.models.story.default_hotness,
+                editable=False,
+                help_text='calculated value representing recent page views.',
+                verbose_name='hotness'
+            ),
+        ),
+        migrations.RunPython(
+            hot_count_to_hotness,
+            reverse_code=hotness_to_hot_count,
+        ),
+        migrations.RemoveField(
+            model_name='story',
+            name='hot_count',
+        ),
+    ]
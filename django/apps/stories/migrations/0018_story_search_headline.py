@@ -0,0 +1,30 @@
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0017_story_hotness'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='search_headline',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunSQL(
+            "UPDATE stories_story SET search_headline = "
+            "concat_ws(' ', working_title, kicker, title, lede)",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_headline'],
+                name='stories_headline_trgm',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ),
+    ]
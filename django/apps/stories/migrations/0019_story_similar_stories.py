@@ -0,0 +1,25 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0018_story_search_headline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='similar_stories',
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.IntegerField(),
+                blank=True,
+                default=list,
+                editable=False,
+                help_text='most similar stories by text, most similar first.',
+                size=None,
+                verbose_name='similar stories'
+            ),
+        ),
+    ]
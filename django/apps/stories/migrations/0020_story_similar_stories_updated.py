@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0019_story_similar_stories'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='similar_stories_updated',
+            field=models.DateTimeField(
+                editable=False,
+                help_text='when similar stories were last found.',
+                null=True,
+                verbose_name='similar stories updated'
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0020_story_similar_stories_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitFlush',
+            fields=[
+                (
+                    'flush_id',
+                    models.CharField(
+                        max_length=32,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='flush id'
+                    )
+                ),
+                (
+                    'created',
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name='created'
+                    )
+                ),
+            ],
+            options={
+                'verbose_name': 'visit flush',
+                'verbose_name_plural': 'visit flushes',
+            },
+        ),
+    ]
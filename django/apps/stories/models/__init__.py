@@ -4,6 +4,7 @@ from .mixins import MarkupCharField, MarkupModelMixin, MarkupTextField
 from .sections import Section, StoryType
 from .story import Story
 from .storychildren import Aside, InlineHtml, Pullquote, StoryImage, StoryVideo
+from .visits import VisitFlush
 
 __all__ = [  # type: ignore
     'Story',
@@ -16,6 +17,7 @@ __all__ = [  # type: ignore
     'InlineLink',
     'InlineHtml',
     'Byline',
+    'VisitFlush',
     'MarkupTextField',
     'MarkupModelMixin',
     'MarkupCharField',
@@ -1,4 +1,5 @@
 import difflib
+from functools import lru_cache
 import json
 import logging
 import re
@@ -8,20 +9,33 @@ from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
 from apps.contributors.models import Contributor
+from utils.cache_tags import instance_tag, model_tag, purge_on_commit
 
 logger = logging.getLogger(__name__)
 bylines_logger = logging.getLogger('bylines')
 
 
+NON_WORD = re.compile(r'\W')
+
+BYLINE_PATTERN = re.compile(
+    # single word credit with colon. Person's name, Person's job title
+    # or similiar description.
+    # Example:
+    # text: Jane Doe, Just a regular person
+    r'^(?P<credit>[^:]+): (?P<full_name>[^,]+)\s*(, (?P<title>.+))?$',
+    flags=re.UNICODE,
+)
+
+
 def needle_in_haystack(needle, haystack):
     """ strips away all spaces and puctuations before comparing. """
-    needle = re.sub(r'\W', '', needle).lower()
+    needle = NON_WORD.sub('', needle).lower()
     diff = diff_match_patch()
     diff.Match_Distance = 5000  # default is 1000
     diff.Match_Threshold = .5  # default is .5
     lines = haystack.splitlines()
     for line in lines:
-        line2 = re.sub(r'\W', '', line).lower()
+        line2 = NON_WORD.sub('', line).lower()
         value = diff.match_main(line2, needle, 0)
         if value is not -1:
             return line
@@ -32,6 +46,68 @@ class BylineManager(models.Manager):
     def ordered(self):
         return self.order_by('ordering', 'pk')
 
+    def create_for_stories(self, raw_bylines):
+        """
+        Create bylines for many stories at once.
+        args:
+            raw_bylines: iterable of (story, legacy byline text)
+        returns:
+            list of new Byline objects
+        Contributors are found with a single query. Only names that are not
+        found use the slow fuzzy lookup in `Contributor.get_or_create`.
+        Stories with malformed bylines get a comment and error status.
+        """
+        parsed, stories, malformed = [], {}, {}
+        for story, raw in raw_bylines:
+            stories[story.pk] = story
+            comment = story.comment
+            lines = clean_up_bylines(raw).splitlines()
+            for ordering, full_byline in enumerate(lines, 1):
+                parsed.append(
+                    (story, ordering, parse_byline(full_byline, story))
+                )
+            if story.comment != comment:
+                malformed[story.pk] = story
+        names = {fields[1] for story, ordering, fields in parsed}
+        contributors = {
+            contributor.display_name: contributor
+            for contributor in Contributor.objects.filter(
+                display_name__in=names
+            )
+        }
+        bylines = []
+        for story, ordering, (credit, full_name, title, initials) in parsed:
+            contributor = contributors.get(full_name)
+            if contributor is None:
+                try:
+                    contributor, __ = Contributor.get_or_create(
+                        full_name, initials
+                    )
+                except ValueError:  # multiple contributors found
+                    continue
+                contributors[full_name] = contributor
+            bylines.append(
+                self.model(
+                    story=story,
+                    ordering=ordering,
+                    credit=credit,
+                    title=title[:200],
+                    contributor=contributor,
+                )
+            )
+        bylines = self.bulk_create(bylines)
+        if malformed:
+            story_model = self.model.story.field.related_model
+            story_model.objects.bulk_update(
+                malformed.values(), ['comment', 'publication_status']
+            )
+        # bulk operations don't send the signals that purge cached pages
+        purge_on_commit(
+            self.model,
+            [model_tag(self.model), *map(instance_tag, stories.values())],
+        )
+        return bylines
+
 
 class Byline(models.Model):
     """ Credits the people who created content for a story. """
@@ -93,83 +169,7 @@ class Byline(models.Model):
         returns:
             Byline object
         """
-        byline_pattern = re.compile(
-            # single word credit with colon. Person's name, Person's job title
-            # or similiar description.
-            # Example:
-            # text: Jane Doe, Just a regular person
-            r'^(?P<credit>[^:]+): (?P<full_name>[^,]+)\s*(, (?P<title>.+))?$',
-            flags=re.UNICODE,
-        )
-
-        match = byline_pattern.match(full_byline)
-        full_name = None
-        try:
-            d = match.groupdict()
-            full_name = d['full_name'].title()
-            title = d['title'] or ''
-            credit = d['credit'].lower()
-            initials = ''.join(
-                letters[0] for letters in full_name.replace('-', ' ').split()
-            )
-            assert initials == initials.upper(
-            ), 'All names should be capitalised'
-            assert len(
-                initials
-            ) <= 5, 'Five names probably means something is wrong.'
-            if len(initials) == 1:
-                initials = full_name.upper()
-
-        except (
-            AssertionError,
-            AttributeError,
-        ) as e:
-            # Malformed byline
-            p_org = w_org = ' -- '
-            if story.legacy_prodsys_source:
-                dump = story.legacy_prodsys_source
-                tekst = json.loads(dump)[0]['fields']['tekst']
-                p_org = needle_in_haystack(full_byline, tekst)
-            if story.legacy_html_source:
-                dump = story.legacy_html_source
-                w_org = json.loads(dump)[0]['fields']['byline']
-
-            warning = ((
-                'Malformed byline: "{byline}" error: {error} id: {id}'
-                ' p_id: {p_id}\n{p_org} | {w_org} '
-            ).format(
-                id=story.id,
-                p_id=story.prodsak_id,
-                # story=story,
-                byline=full_byline,
-                error=e,
-                p_org=p_org,
-                w_org=w_org,
-            ))
-            logger.warn(warning)
-            story.comment += warning
-            story.publication_status = story.STATUS_ERROR
-
-            full_name = 'Nomen Nescio'
-            title = full_byline
-            initials = 'XX'
-            credit = '???'
-
-        for choice in cls.CREDIT_CHOICES:
-            # Find correct credit.
-            ratio = difflib.SequenceMatcher(
-                None,
-                choice[0],
-                credit[:],
-            ).ratio()
-            if .4 > ratio > .8:
-                logger.debug(choice[0], credit, ratio)
-            if ratio > .8:
-                credit = choice[0]
-                break
-        else:
-            credit = cls.DEFAULT_CREDIT
-
+        credit, full_name, title, initials = parse_byline(full_byline, story)
         try:
             contributor, __ = Contributor.get_or_create(full_name, initials)
         except ValueError:  # multiple contributors found
@@ -183,14 +183,80 @@ class Byline(models.Model):
             contributor=contributor,
         )
         new_byline.save()
+        return new_byline
 
 
-def clean_up_bylines(raw_bylines):
+@lru_cache(maxsize=None)
+def normalize_credit(credit):
+    """Find the credit choice matching a credit, or the default credit."""
+    for choice, label in Byline.CREDIT_CHOICES:
+        if difflib.SequenceMatcher(None, choice, credit).ratio() > .8:
+            return choice
+    return Byline.DEFAULT_CREDIT
+
+
+def parse_byline(full_byline, story):
     """
-    Normalise misformatting and idiosyncraticies of bylines in legacy data.
-    string -> string
+    Split a cleaned up byline into credit, full name, title and initials.
+    Malformed bylines are logged in the story comment.
     """
-    replacements = (
+    try:
+        d = BYLINE_PATTERN.match(full_byline).groupdict()
+        full_name = d['full_name'].title()
+        title = d['title'] or ''
+        credit = d['credit'].lower()
+        initials = ''.join(
+            letters[0] for letters in full_name.replace('-', ' ').split()
+        )
+        assert initials == initials.upper(), 'All names should be capitalised'
+        assert len(
+            initials
+        ) <= 5, 'Five names probably means something is wrong.'
+        if len(initials) == 1:
+            initials = full_name.upper()
+
+    except (
+        AssertionError,
+        AttributeError,
+    ) as e:
+        # Malformed byline
+        p_org = w_org = ' -- '
+        if story.legacy_prodsys_source:
+            dump = story.legacy_prodsys_source
+            tekst = json.loads(dump)[0]['fields']['tekst']
+            p_org = needle_in_haystack(full_byline, tekst)
+        if story.legacy_html_source:
+            dump = story.legacy_html_source
+            w_org = json.loads(dump)[0]['fields']['byline']
+
+        warning = ((
+            'Malformed byline: "{byline}" error: {error} id: {id}'
+            ' p_id: {p_id}\n{p_org} | {w_org} '
+        ).format(
+            id=story.id,
+            p_id=story.prodsak_id,
+            # story=story,
+            byline=full_byline,
+            error=e,
+            p_org=p_org,
+            w_org=w_org,
+        ))
+        logger.warn(warning)
+        story.comment += warning
+        story.publication_status = story.STATUS_ERROR
+
+        full_name = 'Nomen Nescio'
+        title = full_byline
+        initials = 'XX'
+        credit = '???'
+
+    return normalize_credit(credit), full_name, title, initials
+
+
+# Regex replacements to clean up legacy bylines, applied in order.
+BYLINE_RULES = [
+    (re.compile(pattern, flags), replacement)
+    for pattern, replacement, flags in (
         # email addresses will die!
         (r'\S+@\S+', '', 0),
 
@@ -297,7 +363,14 @@ def clean_up_bylines(raw_bylines):
         (r'(^(.+?:).+\n)ditto:', r'\1\2', re.M | re.I),
         (r' and ditto:', ':', re.I),
     )
+]
+
 
+def clean_up_bylines(raw_bylines):
+    """
+    Normalise misformatting and idiosyncraticies of bylines in legacy data.
+    string -> string
+    """
     byline_words = []
 
     for word in raw_bylines.split():
@@ -305,8 +378,8 @@ def clean_up_bylines(raw_bylines):
 
     bylines = ' '.join(byline_words)
 
-    for pattern, replacement, flags in replacements[:]:
-        bylines = re.sub(pattern, replacement, bylines, flags=flags)
+    for rule, replacement in BYLINE_RULES:
+        bylines = rule.sub(replacement, bylines)
     bylines = bylines.strip()
     if 'photo:' in bylines:
         bylines = bylines.replace('by:', 'text:')
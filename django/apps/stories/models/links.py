@@ -3,9 +3,9 @@ import re
 
 from bs4 import BeautifulSoup
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import URLValidator, ValidationError
 from django.db import models
+from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
 from model_utils.models import TimeStampedModel
@@ -18,18 +18,57 @@ from .story import Story
 logger = logging.getLogger(__name__)
 
 
+# End of a link tag: `](42)`
+TAG_END = re.compile(r'\]\((?P<number>\d+)\)')
+# Url of a story on this site
+INTERNAL_LINK = re.compile(r'universitas.no/.+?/(?P<id>\d+)/')
+
+
+def http_status_code(url, method='head', timeout=1, session=None):
+    """ Status code of a http request, or the kind of error as a string """
+    send = session.request if session else request
+    try:
+        status_code = send(method, url, timeout=timeout).status_code
+        if status_code == 410:
+            status_code = send('get', url, timeout=timeout).status_code
+        if status_code > 500:
+            status_code = 500
+        return str(status_code)
+    except Timeout:
+        return '408'  # HTTP Timout
+    except MissingSchema:
+        return 'URL'  # not a HTTP url
+    except RequestException:
+        return 'DNS'  # DNS error
+
+
 class InlineLinkManager(models.Manager):
     def markup_to_html(self, text):
         """ replace markup version of tag with html version """
-        for link in self.all():
-            text = link.markup_to_html(text)
-        return text
+        return self.render(text, lambda link: link.get_html())
 
     def insert_urls(self, text):
         """ insert url as reference in link """
-        for link in self.all():
-            text = link.insert_url(text)
-        return text
+        return self.render(text, lambda link: link.get_tag(ref=link.link))
+
+    def render(self, text, replace):
+        """Replace all link tags in a single pass over the text. Links and
+        linked stories are fetched in one query."""
+        links = {}
+        for link in self.select_related('linked_story__story_type__section'):
+            links.setdefault(link.number, []).append(link)
+        parts = []
+        position = 0
+        for match in TAG_END.finditer(text):
+            for link in links.get(int(match.group('number')), []):
+                tag = link.get_tag()
+                start = match.end() - len(tag)
+                if start >= position and text.startswith(tag, start):
+                    parts += [text[position:start], replace(link)]
+                    position = match.end()
+                    break
+        parts.append(text[position:])
+        return ''.join(parts)
 
 
 class InlineLink(TimeStampedModel):
@@ -108,15 +147,11 @@ class InlineLink(TimeStampedModel):
 
     def markup_to_html(self, text):
         """ replace markup version of tag with html version """
-        text = re.sub(re.escape(self.get_tag()), self.get_html(), text)
-        return text
+        return text.replace(self.get_tag(), self.get_html())
 
     def insert_url(self, text):
         """ insert url as reference in link """
-        text = re.sub(
-            re.escape(self.get_tag()), self.get_tag(ref=self.link), text
-        )
-        return text
+        return text.replace(self.get_tag(), self.get_tag(ref=self.link))
 
     def get_html(self):
         """ get <a> html tag for the link """
@@ -140,29 +175,37 @@ class InlineLink(TimeStampedModel):
             return self.href
         return ''
 
-    def find_linked_story(self):
+    @staticmethod
+    def internal_story_id(href):
+        """ Story id if href is an url of a story on this site """
+        match = INTERNAL_LINK.search(href or '')
+        return int(match.group('id')) if match else None
+
+    def find_linked_story(self, stories=None):
         """
         Change literal url to foreign key if the target is
         another article in the database.
+        `stories` is an optional dict of prefetched stories by id.
         """
         if not self.href or self.linked_story:
             return False
 
-        if not self.linked_story:
-            match = re.search(r'universitas.no/.+?/(?P<id>\d+)/', self.href)
-            try:
-                story = Story.objects.get(pk=int(match.group('id')))
-            except (AttributeError, ObjectDoesNotExist):
-                return False  # Not an internal link
-            else:
-                if story == self.parent_story:
-                    return False  # Avoid looooops
-                else:
-                    self.linked_story = story
+        pk = self.internal_story_id(self.href)
+        if pk is None:
+            return False  # Not an internal link
+        if stories is None:
+            story = Story.objects.filter(pk=pk).first()
+        else:
+            story = stories.get(pk)
+        if story is None:
+            return False
+        if story.pk == self.parent_story_id:
+            return False  # Avoid looooops
 
+        self.linked_story = story
         self.href = ''
-        self.alt_text = self.linked_story.title
-        return self.linked_story
+        self.alt_text = story.title
+        return story
 
     def save(self, *args, **kwargs):
         self.find_linked_story()
@@ -178,21 +221,7 @@ class InlineLink(TimeStampedModel):
             url = ''
         else:
             url = self.validate_url(self.link)
-            try:
-                status_code = request(method, url, timeout=timeout).status_code
-                if status_code == 410:
-                    status_code = request(
-                        'get', url, timeout=timeout
-                    ).status_code
-                if status_code > 500:
-                    status_code = 500
-                status_code = str(status_code)
-            except Timeout:
-                status_code = '408'  # HTTP Timout
-            except MissingSchema:
-                status_code = 'URL'  # not a HTTP url
-            except RequestException:
-                status_code = 'DNS'  # DNS error
+            status_code = http_status_code(url, method, timeout)
 
         if save_if_changed and status_code != self.status_code:
             self.status_code = status_code
@@ -210,39 +239,55 @@ class InlineLink(TimeStampedModel):
         Return text with updated markup for the changed links.
         """
         body = cls.convert_html_links(body)
-        found_links = re.finditer(cls.find_pattern, body)
-        queryset = parent_story.inline_links.all()
-
-        number = queryset.count() + 1
-        for match in found_links:
+        matches = list(re.finditer(cls.find_pattern, body))
+
+        existing = {}
+        for link in parent_story.inline_links.order_by('pk'):
+            existing.setdefault(link.number, []).append(link)
+        numbers = [int(m.group('ref')) for m in matches
+                   if re.match(r'^\d+$', m.group('ref'))]
+        number = max([0, *existing, *numbers]) + 1
+
+        internal = {cls.internal_story_id(m.group('ref')) for m in matches}
+        internal.discard(None)
+        stories = {}
+        if internal:
+            stories = Story.objects.only('title').in_bulk(internal)
+
+        created, changed, replacements = [], {}, {}
+        for match in matches:
+            original_markup = match.group(0)
+            if original_markup in replacements:
+                continue
             ref = match.group('ref')
             text = match.group('text')
-            original_markup = re.escape(match.group(0))
             new_markup = []
 
             if re.match(r'^\d+$', ref):
                 # ref is an integer
                 ref = int(ref)
-                links = queryset.filter(number=ref)
+                links = existing.get(ref)
                 if not links:
-                    link = cls.objects.create(
-                        number=ref,
-                        parent_story=parent_story,
+                    link = cls(
+                        number=ref, text=text, parent_story=parent_story
                     )
+                    created.append(link)
                 else:
                     link = links[0]
                     if link.text != text:
                         link.text = text
-                        link.save()
+                        if link.pk:
+                            changed[link.pk] = link
 
                     for otherlink in links[1:]:
                         otherlink.number = number
-                        otherlink.save()
+                        changed[otherlink.pk] = otherlink
                         number += 1
                         msg = 'multiple links with same ref: ({0}) {1} {2}'
                         msg = msg.format(ref, link, otherlink)
                         logger.warn(msg)
                         new_markup.append(otherlink.get_tag())
+                existing[ref] = [link]
 
             else:
                 # ref is a url
@@ -254,13 +299,28 @@ class InlineLink(TimeStampedModel):
                     text=text,
                 )
                 number += 1
-                link.save()
+                link.find_linked_story(stories)
+                created.append(link)
 
             new_markup = [link.get_tag()] + new_markup
-            new_markup = ' '.join(new_markup)
-
-            body = re.sub(original_markup, new_markup, body)
-        return body
+            replacements[original_markup] = ' '.join(new_markup)
+
+        if created:
+            cls.objects.bulk_create(created)
+        if changed:
+            # bulk_update doesn't update `modified` by itself
+            now = timezone.now()
+            for link in changed.values():
+                link.modified = now
+            cls.objects.bulk_update(
+                changed.values(), ['text', 'number', 'modified']
+            )
+
+        return re.sub(
+            cls.find_pattern,
+            lambda match: replacements.get(match.group(0), match.group(0)),
+            body,
+        )
 
     @classmethod
     def convert_html_links(cls, bodytext, return_html=False):
@@ -1,5 +1,6 @@
 """Related stories"""
 
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
@@ -14,6 +15,20 @@ class RelatedStoriesMixin(models.Model):
         blank=True,
         symmetrical=True,
     )
+    similar_stories = ArrayField(
+        models.IntegerField(),
+        default=list,
+        blank=True,
+        editable=False,
+        help_text=_('most similar stories by text, most similar first.'),
+        verbose_name=_('similar stories'),
+    )
+    similar_stories_updated = models.DateTimeField(
+        null=True,
+        editable=False,
+        help_text=_('when similar stories were last found.'),
+        verbose_name=_('similar stories updated'),
+    )
 
     @property
     def related_published(self):
@@ -29,7 +44,15 @@ class RelatedStoriesMixin(models.Model):
         ).order_by('age')
         linked = self.inline_links.values_list('linked_story', flat=True)
         related = list(others.filter(pk__in=linked))
-        if self.theme_word:
+        if self.similar_stories:
+            # precomputed by apps.stories.similarity
+            similar = others.filter(pk__in=self.similar_stories)
+            order = self.similar_stories.index
+            related += [
+                story for story in sorted(similar, key=lambda s: order(s.pk))
+                if story not in related
+            ]
+        if len(related) < number and self.theme_word:
             related += list(others.filter(theme_word=self.theme_word)[:number])
         if len(related) < number:
             related += list(others.filter(story_type=self.story_type)[:number])
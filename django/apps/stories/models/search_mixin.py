@@ -1,3 +1,8 @@
+from datetime import datetime
+from functools import reduce
+import hashlib
+import operator
+
 from django.contrib.postgres.indexes import GinIndex
 from django.contrib.postgres.search import (
     SearchQuery,
@@ -5,20 +10,76 @@ from django.contrib.postgres.search import (
     SearchVector,
     SearchVectorField,
 )
+from django.core.cache import cache
 from django.db.models import (
     Case,
     ExpressionWrapper,
     F,
     FloatField,
+    IntegerField,
     Model,
     QuerySet,
+    TextField,
     Value,
     When,
 )
 from django.db.models.functions import Concat
 from django.utils.timezone import now
 
-from utils.dbfuncs import LogAge, TrigramWordSimilarity
+from utils.dbfuncs import LogAge, TrigramWordSimilar, TrigramWordSimilarity
+
+TextField.register_lookup(TrigramWordSimilar)
+
+
+# Fields included in the search vector, by search weight.
+WEIGHTED_FIELDS = {
+    'A': ['working_title', 'title', 'kicker', 'theme_word'],
+    'B': ['lede'],
+    'C': ['bodytext_markup'],
+}
+# Changes to these fields make the search vector stale.
+SEARCH_FIELDS = ['language'] + [
+    field for fields in WEIGHTED_FIELDS.values() for field in fields
+]
+# Fields combined in the headline used for trigram search.
+HEADLINE_FIELDS = ['working_title', 'kicker', 'title', 'lede']
+# Lowest trigram cutoff. Set as `pg_trgm.word_similarity_threshold` for each
+# database connection in settings, so the trigram index can be used.
+TRIGRAM_THRESHOLD = 0.5
+# Ranked search results are cached as a list of at most this many ids.
+SEARCH_CANDIDATES = 200
+SEARCH_CACHE_TIMEOUT = 5 * 60
+# Only this many of the newest index matches are ranked for the cached list.
+SEARCH_CANDIDATE_POOL = 10 * SEARCH_CANDIDATES
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+def cache_key_params(params):
+    """Query params for cache keys. Times are rounded down, so that querysets
+    filtered by the current time, such as `published()`, share a key."""
+    return [
+        int(param.timestamp() // SEARCH_CACHE_TIMEOUT)
+        if isinstance(param, datetime) else param for param in params
+    ]
+
+
+def build_search_headline():
+    parts = [F(field) for field in HEADLINE_FIELDS]
+    for index in range(len(parts) - 1, 0, -1):
+        parts.insert(index, Value(' '))
+    return Concat(*parts)
+
+
+def build_search_vector(config):
+    return reduce(
+        operator.add, [
+            SearchVector(*fields, weight=weight, config=config)
+            for weight, fields in WEIGHTED_FIELDS.items()
+        ]
+    )
 
 
 class FullTextSearchQuerySet(QuerySet):
@@ -27,40 +88,56 @@ class FullTextSearchQuerySet(QuerySet):
     case_config = Case(
         When(language='en', then=Value('english')), default=Value(config)
     )
-    vector = (
-        SearchVector(
-            'working_title',
-            'title',
-            'kicker',
-            'theme_word',
-            weight='A',
-            config=case_config,
-        ) + SearchVector(
-            'lede',
-            weight='B',
-            config=case_config,
-        ) + SearchVector(
-            'bodytext_markup',
-            weight='C',
-            config=case_config,
-        )
-    )
+    vector = build_search_vector(case_config)
 
-    def search(self, query):
+    def search(self, query, candidates=None):
+        """Search results ordered by rank and age. With `candidates`, only
+        that many of the newest matches are ranked."""
         if not isinstance(query, str):
             msg = f'expected query to be str, got {type(query)}, {query!r}'
             raise ValueError(msg)
         result = None
         if len(query) > 5:
-            result = self.search_vector_rank(query)
-        if not result:
-            result = self.trigram_search_rank(query)
+            result = self.search_vector_rank(query, candidates=candidates)
+        if result is None or not result.exists():
+            result = self.trigram_search_rank(query, candidates=candidates)
         return result.with_age('publication_date').annotate(
             combined_rank=ExpressionWrapper(
                 F('rank') / F('age'), FloatField()
             )
         ).order_by('-combined_rank')
 
+    def search_ids(self, query, limit=SEARCH_CANDIDATES):
+        """Primary keys of the top ranked search results. The list is cached
+        for each normalized query and base queryset."""
+        query = normalize_query(query)
+        sql, params = self.query.sql_with_params()
+        params = cache_key_params(params)
+        digest = hashlib.md5(f'{sql}{params}{query}'.encode()).hexdigest()
+        cache_key = f'search:{self.model._meta.label_lower}:{limit}:{digest}'
+        ids = cache.get(cache_key)
+        if ids is None:
+            result = self.search(query, candidates=SEARCH_CANDIDATE_POOL)
+            ids = list(result.values_list('pk', flat=True)[:limit])
+            cache.set(cache_key, ids, SEARCH_CACHE_TIMEOUT)
+        return ids
+
+    def search_ranked(self, query):
+        """Search results annotated and ordered by `search_position`, which
+        can be used as a keyset pagination cursor. `search_total` is the
+        number of results."""
+        ids = self.search_ids(query)
+        if not ids:
+            return self.none()
+        position = Case(
+            *[When(pk=pk, then=Value(n)) for n, pk in enumerate(ids)],
+            output_field=IntegerField(),
+        )
+        return self.filter(pk__in=ids).annotate(
+            search_position=position,
+            search_total=Value(len(ids), IntegerField()),
+        ).order_by('search_position')
+
     def with_age(self, field='created', when=None):
         if when is None:
             when = now()
@@ -70,30 +147,44 @@ class FullTextSearchQuerySet(QuerySet):
             )
         )
 
-    def trigram_search_rank(self, query, cutoff=None):
+    def _candidates(self, limit=None, **lookup):
+        """Rows matching an indexed lookup. With `limit`, only the newest
+        matches, found without ranking them."""
+        if limit is None:
+            return self.filter(**lookup)
+        newest = self.filter(**lookup).order_by(
+            F('publication_date').desc(nulls_last=True)
+        )
+        return self.filter(pk__in=newest.values('pk')[:limit])
+
+    def trigram_search_rank(self, query, cutoff=None, candidates=None):
         """Perform postgresql trigram word similarity lookup"""
 
         # stricter cutoff for short queries
         if cutoff is None:
             cutoff = 1 - min(5, len(query)) / 10
 
-        head = Concat(
-            F('working_title'), Value(' '), F('kicker'), Value(' '),
-            F('title'), Value(' '), F('lede')
-        )
-        ranker = TrigramWordSimilarity(head, query)
-        return self.annotate(rank=ranker).filter(rank__gt=cutoff)
+        ranker = TrigramWordSimilarity('search_headline', query)
+        # The operator lookup narrows down candidates using the index.
+        return self._candidates(
+            candidates, search_headline__trigram_word_similar=query
+        ).annotate(rank=ranker).filter(rank__gt=cutoff)
 
-    def search_vector_rank(self, query, cutoff=0.2):
+    def search_vector_rank(self, query, cutoff=0.2, candidates=None):
         """Perform postgresql full text search using search vector."""
-        ranker = SearchRank(
-            F('search_vector'), SearchQuery(query, config=self.config)
-        )
-        return self.annotate(rank=ranker).filter(rank__gt=cutoff)
+        search_query = SearchQuery(query, config=self.config)
+        ranker = SearchRank(F('search_vector'), search_query)
+        # The match lookup uses the index to find candidates.
+        return self._candidates(
+            candidates, search_vector=search_query
+        ).annotate(rank=ranker).filter(rank__gt=cutoff)
 
     def update_search_vector(self):
         """Calculate and store search vector in the database."""
-        return self.update(search_vector=self.vector)
+        return self.update(
+            search_vector=self.vector,
+            search_headline=build_search_headline(),
+        )
 
 
 class FullTextSearchMixin(Model):
@@ -102,10 +193,43 @@ class FullTextSearchMixin(Model):
         editable=False,
         null=True,
     )
+    search_headline = TextField(
+        editable=False,
+        blank=True,
+        default='',
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._search_snapshot = instance._search_field_values()
+        return instance
+
+    def _search_field_values(self):
+        # Deferred fields are not in __dict__, and are not loaded here.
+        return {field: self.__dict__.get(field) for field in SEARCH_FIELDS}
+
+    def search_fields_changed(self):
+        """Has any field in the search vector changed since loaded from db"""
+        snapshot = getattr(self, '_search_snapshot', None)
+        return snapshot != self._search_field_values()
+
+    def save(self, *args, **kwargs):
+        self.search_headline = ' '.join(
+            getattr(self, field) or '' for field in HEADLINE_FIELDS
+        )
+        super().save(*args, **kwargs)
+        self._search_snapshot = self._search_field_values()
 
     class Meta:
         indexes = [
             # Create database index for search vector for improved performance
             GinIndex(fields=['search_vector']),
+            # Trigram index for fuzzy search in headlines
+            GinIndex(
+                fields=['search_headline'],
+                name='stories_headline_trgm',
+                opclasses=['gin_trgm_ops'],
+            ),
         ]
         abstract = True
@@ -1,21 +1,28 @@
 """ The main content model """
 
+from datetime import datetime
 import logging
+import math
 
 from django.conf import settings
-from django.core.cache import cache
-from django.db import models
+from django.db import connection, models
+from django.dispatch import receiver
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django_extensions.db.fields import AutoSlugField
+from django_redis import get_redis_connection
 from model_utils.models import TimeStampedModel
 from slugify import Slugify
 
 from apps.contributors.models import Contributor
 from apps.frontpage.models import FrontpageStory
+from apps.stories import most_read
+from utils.bloom import RotatingBloomFilter
+from utils.bots import is_bot
 from utils.decorators import cache_memoize
 from utils.model_mixins import EditURLMixin
+from utils.suggest import SuggestIndex
 
 from .mixins import MarkupCharField, MarkupTextField, TextContent
 from .related_stories import RelatedStoriesMixin
@@ -27,6 +34,31 @@ slugify = Slugify(max_length=50, to_lower=True)
 logger = logging.getLogger(__name__)
 
 FACEBOOK_THUMBSIZE = '800x420'
+# Characters of new stories used to guess their language
+LANGUAGE_SAMPLE = 5000
+# Page views from the same ip address within 5 to 10 minutes count once.
+recent_visitors = RotatingBloomFilter('story_visitors', window=5 * 60)
+# Typeahead suggestions for headlines of published stories.
+headline_suggestions = SuggestIndex('stories')
+
+# Hotness is stored as the log of recent page views, plus a term that grows
+# linearly with time. Ordering by stored hotness is the same as ordering by
+# decayed page views, so old values never have to be rewritten.
+HOTNESS_EPOCH = datetime(2015, 1, 1, tzinfo=timezone.utc)
+HOTNESS_LIFETIME = 100  # hours until recent page views decay by a factor e
+INITIAL_HOT_COUNT = 1000  # All stories are hot when first published!
+VISIT_HOT_COUNT = 100
+
+
+def hotness_offset(when=None):
+    """Hotness gained by the passage of time since HOTNESS_EPOCH"""
+    when = when or timezone.now()
+    hours = (when - HOTNESS_EPOCH).total_seconds() / 3600
+    return hours / HOTNESS_LIFETIME
+
+
+def default_hotness():
+    return math.log(INITIAL_HOT_COUNT) + hotness_offset()
 
 
 class StoryQuerySet(FullTextSearchQuerySet, models.QuerySet):
@@ -40,17 +72,40 @@ class StoryQuerySet(FullTextSearchQuerySet, models.QuerySet):
         ).filter(publication_date__lt=now
                  ).select_related('story_type__section')
 
+    def hottest(self):
+        """Stories with the most recent page views first"""
+        return self.order_by('-hotness')
+
 
 class PublishedStoryManager(models.Manager):
     def get_queryset(self):
         return StoryQuerySet(self.model, using=self._db)
 
-    def devalue_hotness(self, factor=1.0):
-        """Devalue hot count for all stories."""
-        hot_stories = self.filter(hot_count__gte=1)
-        hot_stories.update(hot_count=(models.F('hot_count') - 1) * factor)
-        cold_stories = self.filter(hot_count__gt=0, hot_count__lt=1)
-        cold_stories.update(hot_count=0)
+    def add_visits(self, visits):
+        """Add visit counts to many stories with a single query.
+
+        visits: mapping of story pk to number of new visits
+        """
+        if not visits:
+            return 0
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        rows = ', '.join(['(%s, %s)'] * len(visits))
+        offset = hotness_offset()
+        params = [offset, VISIT_HOT_COUNT, offset]
+        params += [int(value) for item in visits.items() for value in item]
+        with connection.cursor() as cursor:
+            # decay hotness to now, add new visits, and shift back again
+            cursor.execute(
+                f'UPDATE {table} AS story SET '
+                'hit_count = story.hit_count + visits.n, '
+                'hotness = ln('
+                'exp(greatest(story.hotness - %s, -700)) + %s * visits.n'
+                ') + %s '
+                f'FROM (VALUES {rows}) AS visits (id, n) '
+                'WHERE story.id = visits.id',
+                params,
+            )
+            return cursor.rowcount
 
 
 class Story(  # type: ignore
@@ -62,7 +117,7 @@ class Story(  # type: ignore
 ):
     """ An article or story in the newspaper. """
 
-    VISIT_KEY_PREFIX = 'story_hit_'
+    VISITS_KEY = 'story_visits'
 
     class Meta(FullTextSearchMixin.Meta):
         abstract = False
@@ -208,11 +263,12 @@ class Story(  # type: ignore
         help_text=_('how many time the article has been viewed.'),
         verbose_name=_('total page views')
     )
-    hot_count = models.PositiveIntegerField(
-        default=1000,  # All stories are hot when first published!
+    hotness = models.FloatField(
+        default=default_hotness,
         editable=False,
+        db_index=True,
         help_text=_('calculated value representing recent page views.'),
-        verbose_name=_('recent page views')
+        verbose_name=_('hotness')
     )
     legacy_html_source = models.TextField(
         blank=True,
@@ -263,8 +319,20 @@ class Story(  # type: ignore
         if self.is_published(False) and not self.publication_date:
             self.publication_date = timezone.now()
 
+        if not self.pk and self.language == settings.LANGUAGES[0][0]:
+            from apps.stories.language import guess_language
+            self.language = guess_language(
+                self.bodytext_markup[:LANGUAGE_SAMPLE], default=self.language
+            )
+
+        search_changed = self.search_fields_changed()
+
         super().save(*args, **kwargs)
 
+        if search_changed:
+            from apps.stories.tasks import schedule_search_vector_update
+            schedule_search_vector_update(self.pk)
+
         if self.publication_status == self.STATUS_TO_DESK:
             from apps.stories.tasks import upload_storyimages
             upload_storyimages.delay(self.pk)
@@ -276,6 +344,26 @@ class Story(  # type: ignore
             # build up image cache
             self.facebook_thumb()
 
+        most_read.store_story(self)
+        self.update_headline_suggestions()
+
+    def update_headline_suggestions(self):
+        if self.is_published():
+            headline_suggestions.add(
+                self.pk, self.title, {
+                    'id': self.pk,
+                    'title': self.title,
+                    'url': self.get_absolute_url(),
+                }
+            )
+        else:
+            headline_suggestions.remove(self.pk)
+
+    @property
+    def hot_count(self):
+        """Recent page views, decayed until now"""
+        return math.exp(self.hotness - hotness_offset())
+
     @property
     def comments_plugin(self):
         if self.is_published():
@@ -286,12 +374,10 @@ class Story(  # type: ignore
     def register_visit_in_cache(cls, pk, n=1):
         """Register valid visit in cache. Use scheduled task to persist in
         database."""
-        hit_key = f'{cls.VISIT_KEY_PREFIX}{pk}'
-        try:
-            cache.incr(hit_key, n)
-        except ValueError:
-            NEVER = None
-            cache.add(hit_key, n, timeout=NEVER)
+        pipe = get_redis_connection().pipeline()
+        pipe.hincrby(cls.VISITS_KEY, pk, n)
+        most_read.register_visit(pk, n, pipeline=pipe)
+        pipe.execute()
 
     def is_published(self, check_date=True):
         """Is this Story public"""
@@ -325,26 +411,25 @@ class Story(  # type: ignore
         if not self.is_published():
             # Only count hits on published pages.
             return False
-        user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
         ip = request.META.get('REMOTE_ADDR')
-
-        if not user_agent or not ip:
-            # Visitor is not using a web browser.
+        if not ip:
             return False
 
-        bots = ['bot', 'spider', 'yahoo', 'crawler']
-        if any(bot in user_agent for bot in bots):
-            # Search engine web crawler.
+        try:
+            bot = request.is_bot
+        except AttributeError:
+            bot = is_bot(request.META.get('HTTP_USER_AGENT', ''))
+        if bot:
+            # Search engine web crawler, or not a web browser.
             return False
 
-        cache_key = f'{self.pk}_{ip}'
-        if cache.get(cache_key):
-            # same ip address has visited page recently
-            return False
-        else:
-            FIVE_MINUTES = 60 * 5
-            cache.set(cache_key, 1, timeout=FIVE_MINUTES)
-            return True
+        return not self.is_repeat_visit(self.pk, request)
+
+    @classmethod
+    def is_repeat_visit(cls, pk, request):
+        """Check if same ip address has visited page recently"""
+        ip = request.META.get('REMOTE_ADDR')
+        return recent_visitors.add(f'{pk}_{ip}')
 
     def get_bylines(self):
         # with translation.override()
@@ -369,7 +454,7 @@ class Story(  # type: ignore
         """ Get the top image if there is any. """
         return self.images.order_by('-size', '-ordering').first()
 
-    @cache_memoize(60 * 60)
+    @cache_memoize(60 * 60, lock_timeout=10)
     def facebook_thumb(self):
         try:
             imagefile = self.main_image().imagefile
@@ -456,3 +541,8 @@ class Story(  # type: ignore
         self.asides.all().delete()
         self.pullquotes.all().delete()
         self.bodytext_markup = value
+
+
+@receiver(models.signals.post_delete, sender=Story)
+def remove_deleted_story(sender, instance, **kwargs):
+    most_read.remove_story(instance.pk)
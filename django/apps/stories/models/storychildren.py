@@ -240,7 +240,7 @@ class StoryImage(StoryMedia):
     def small(self):
         return self.imagefile.small
 
-    @cache_memoize()
+    @cache_memoize(local_timeout=30)
     def large(self):
         return self.imagefile.large.url
 
@@ -255,7 +255,7 @@ class StoryImage(StoryMedia):
             height = width * self.aspect_ratio
         return int(width), int(height)
 
-    @cache_memoize()
+    @cache_memoize(local_timeout=30)
     def cropped(self):
         width, height = self.crop_size
         im = self.imagefile
@@ -0,0 +1,26 @@
+"""Saved flushes of story visit counts"""
+
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+
+class VisitFlush(models.Model):
+    """A batch of visit counts that has been added to the stories. Saved in
+    the same transaction as the counts, so a batch is never added twice."""
+
+    class Meta:
+        verbose_name = _('visit flush')
+        verbose_name_plural = _('visit flushes')
+
+    flush_id = models.CharField(
+        primary_key=True,
+        max_length=32,
+        verbose_name=_('flush id'),
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('created'),
+    )
+
+    def __str__(self):
+        return self.flush_id
@@ -0,0 +1,123 @@
+"""Most read stories in rolling time windows.
+
+Visits are counted in redis sorted sets, one for each time bucket. Buckets
+expire by themselves when they fall out of the longest window they are used
+for, and the top list for a window is the union of its buckets.
+"""
+
+import json
+import time
+
+from django_redis import get_redis_connection
+
+KEY_PREFIX = 'most_read'
+STORIES_KEY = f'{KEY_PREFIX}:stories'
+TOP_LIST_TIMEOUT = 60
+
+# window name: (window length, bucket size) in seconds
+WINDOWS = {
+    '1h': (60 * 60, 5 * 60),
+    '24h': (24 * 60 * 60, 60 * 60),
+    '7d': (7 * 24 * 60 * 60, 24 * 60 * 60),
+}
+
+
+def _bucket_key(size, when):
+    return f'{KEY_PREFIX}:{size}:{int(when // size)}'
+
+
+def _bucket_keys(window, when):
+    length, size = WINDOWS[window]
+    return [
+        _bucket_key(size, when - offset)
+        for offset in range(0, length, size)
+    ]
+
+
+def _top_list_key(window, keys):
+    return f'{KEY_PREFIX}:top:{window}:{keys[0]}'
+
+
+def register_visit(pk, n=1, when=None, pipeline=None):
+    """Count visits to story in all time windows."""
+    when = time.time() if when is None else when
+    pipe = pipeline or get_redis_connection().pipeline()
+    for length, size in WINDOWS.values():
+        key = _bucket_key(size, when)
+        pipe.zincrby(key, n, pk)
+        pipe.expire(key, length + size)
+    if pipeline is None:
+        pipe.execute()
+
+
+def top_stories(window='24h', limit=10, when=None):
+    """Primary keys and visit counts of the most read stories."""
+    when = time.time() if when is None else when
+    keys = _bucket_keys(window, when)
+    redis = get_redis_connection()
+    top_list = _top_list_key(window, keys)
+    if not redis.exists(top_list):
+        pipe = redis.pipeline()
+        pipe.zunionstore(top_list, keys)
+        pipe.expire(top_list, TOP_LIST_TIMEOUT)
+        pipe.execute()
+    return [(int(pk), int(score))
+            for pk, score in redis.zrevrange(
+                top_list, 0, limit - 1, withscores=True
+            )]
+
+
+def story_info(story):
+    """Data about the story needed to show it in the list."""
+    return {
+        'id': story.pk,
+        'title': story.title,
+        'kicker': story.kicker,
+        'url': story.get_absolute_url(),
+        'section': story.section.title,
+    }
+
+
+def store_story(story):
+    """Keep data about published story in redis."""
+    redis = get_redis_connection()
+    if story.is_published():
+        redis.hset(STORIES_KEY, story.pk, json.dumps(story_info(story)))
+    else:
+        redis.hdel(STORIES_KEY, story.pk)
+
+
+def remove_story(pk, when=None):
+    """Forget a deleted story."""
+    when = time.time() if when is None else when
+    pipe = get_redis_connection().pipeline()
+    pipe.hdel(STORIES_KEY, pk)
+    for window in WINDOWS:
+        keys = _bucket_keys(window, when)
+        for key in [*keys, _top_list_key(window, keys)]:
+            pipe.zrem(key, pk)
+    pipe.execute()
+
+
+def most_read(window='24h', limit=10, when=None):
+    """Most read stories, with data from redis only, unless a story has been
+    published without being saved since."""
+    # Fetch some extra, since unpublished stories might have been visited.
+    top = top_stories(window, limit * 2, when)
+    if not top:
+        return []
+    redis = get_redis_connection()
+    pks = [pk for pk, visits in top]
+    infos = dict(zip(pks, redis.hmget(STORIES_KEY, pks)))
+    missing = [pk for pk, info in infos.items() if info is None]
+    if missing:
+        from apps.stories.models import Story
+        stories = Story.objects.published().filter(pk__in=missing)
+        for story in stories:
+            infos[story.pk] = json.dumps(story_info(story))
+            redis.hset(STORIES_KEY, story.pk, infos[story.pk])
+    results = []
+    for pk, visits in top:
+        if infos[pk] is not None:
+            results.append({**json.loads(infos[pk]), 'visits': visits})
+    return results[:limit]
@@ -0,0 +1,165 @@
+"""Related stories by text similarity.
+
+Stories are represented as tf-idf weighted vectors of the lexemes in their
+full text search vectors. Nearest neighbours by cosine similarity are found
+with sparse matrix products in batches, and stored on each story, so looking
+them up later is a single array field.
+"""
+
+from multiprocessing import Pool
+import re
+
+from django.db.models import F, Q
+from django.utils import timezone
+import numpy as np
+from scipy import sparse
+
+from apps.stories.models import Story
+
+# Text representation of tsvector, such as `'cat':3A 'fat':2,4C 'rat'`
+LEXEME = re.compile(r"'((?:[^']|'')+)'(?::(\S+))?")
+# Same as the default weights in postgresql ts_rank
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+
+def parse_tsvector(text):
+    """Weighted term frequencies from a tsvector."""
+    terms = {}
+    for match in LEXEME.finditer(text or ''):
+        lexeme, positions = match.groups()
+        if positions:
+            weight = sum(
+                WEIGHTS.get(position[-1], WEIGHTS['D'])
+                for position in positions.split(',')
+            )
+        else:
+            weight = WEIGHTS['D']
+        terms[lexeme.replace("''", "'")] = weight
+    return terms
+
+
+def tfidf_matrix(documents):
+    """Sparse matrix with one normalized tf-idf vector per document."""
+    vocabulary = {}
+    rows, columns, values = [], [], []
+    for row, terms in enumerate(documents):
+        for term, frequency in terms.items():
+            rows.append(row)
+            columns.append(vocabulary.setdefault(term, len(vocabulary)))
+            values.append(frequency)
+    shape = (len(documents), len(vocabulary))
+    matrix = sparse.csr_matrix(
+        (np.log1p(np.array(values, dtype=np.float32)), (rows, columns)),
+        shape=shape,
+        dtype=np.float32,
+    )
+    document_frequency = np.bincount(matrix.indices, minlength=shape[1])
+    idf = np.log((1 + shape[0]) / (1 + document_frequency)) + 1
+    matrix = matrix @ sparse.diags(idf.astype(np.float32))
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+def nearest_neighbours(matrix, rows, number):
+    """Most similar other rows in matrix, for each of rows."""
+    rows = np.asarray(rows)
+    number = min(number, matrix.shape[0] - 1)
+    if number < 1 or not len(rows):
+        return [[] for row in rows]
+    similarity = (matrix[rows] @ matrix.T).toarray()
+    similarity[np.arange(len(rows)), rows] = 0
+    top = np.argpartition(-similarity, number - 1, axis=1)[:, :number]
+    neighbours = []
+    for row, candidates in zip(similarity, top):
+        candidates = candidates[np.argsort(-row[candidates])]
+        neighbours.append([int(n) for n in candidates if row[n] > 0])
+    return neighbours
+
+
+_matrix = None
+
+
+def _init_worker(matrix):
+    global _matrix
+    _matrix = matrix
+
+
+def _neighbours_batch(args):
+    rows, number = args
+    return rows, nearest_neighbours(_matrix, rows, number)
+
+
+def similar_documents(documents, rows=None, **kwargs):
+    """Find similar documents for rows (default all). Returns a dict of row
+    index to list of row indices, most similar first."""
+    return similar_rows(tfidf_matrix(documents), rows, **kwargs)
+
+
+def similar_rows(matrix, rows=None, number=5, batch_size=256, processes=1):
+    """Nearest neighbours of rows (default all) in a tf-idf matrix."""
+    if rows is None:
+        rows = range(matrix.shape[0])
+    rows = list(rows)
+    batches = [(rows[n:n + batch_size], number)
+               for n in range(0, len(rows), batch_size)]
+    if processes > 1:
+        with Pool(processes, _init_worker, (matrix, )) as pool:
+            results = pool.imap_unordered(_neighbours_batch, batches)
+            return {
+                row: neighbours
+                for batch, result in results
+                for row, neighbours in zip(batch, result)
+            }
+    _init_worker(matrix)
+    return {
+        row: neighbours
+        for batch, result in map(_neighbours_batch, batches)
+        for row, neighbours in zip(batch, result)
+    }
+
+
+def update_similar_stories(missing=False, number=5, processes=1):
+    """Store similar stories for published stories. The whole archive is
+    used as corpus. If `missing` is True, only stories that are new or
+    changed since last time are updated, along with the stories they are
+    most similar to, which might have them as new neighbours. Returns number
+    of updated stories."""
+    stories = Story.objects.published().exclude(search_vector=None)
+    if missing:
+        stale = set(
+            stories.filter(
+                Q(similar_stories_updated=None)
+                | Q(similar_stories_updated__lt=F('modified'))
+            ).values_list('pk', flat=True)
+        )
+        if not stale:
+            return 0
+    pks, vectors = [], []
+    for pk, vector in stories.values_list('pk', 'search_vector').iterator():
+        pks.append(pk)
+        vectors.append(parse_tsvector(vector))
+    matrix = tfidf_matrix(vectors)
+    options = {'number': number, 'processes': processes}
+    if missing:
+        rows = [n for n, pk in enumerate(pks) if pk in stale]
+        neighbours = similar_rows(matrix, rows, **options)
+        affected = {n for similar in neighbours.values() for n in similar}
+        neighbours.update(
+            similar_rows(matrix, affected.difference(rows), **options)
+        )
+    else:
+        neighbours = similar_rows(matrix, **options)
+    now = timezone.now()
+    updated = [
+        Story(
+            pk=pks[row],
+            similar_stories=[pks[n] for n in similar],
+            similar_stories_updated=now,
+        ) for row, similar in neighbours.items()
+    ]
+    Story.objects.bulk_update(
+        updated, ['similar_stories', 'similar_stories_updated'],
+        batch_size=500
+    )
+    return len(updated)
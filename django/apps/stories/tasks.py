@@ -3,37 +3,75 @@
 from datetime import timedelta
 from pathlib import Path
 import re
+import uuid
 
 from celery import shared_task
 from celery.schedules import crontab
 from celery.task import periodic_task
 from celery.utils.log import get_task_logger
 from django.core.cache import cache
-from django.db.models import F, Q
+from django.db import transaction
 from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
 
 from apps.issues.models import current_issue
 from apps.photo.tasks import upload_imagefile_to_desken
+from utils.cache_lock import CacheLock
 
-from .models import Story
+from .models import Story, VisitFlush
+from .similarity import update_similar_stories
 
 logger = get_task_logger(__name__)
 
 # cron timing
 UPDATE_SEARCH = timedelta(hours=1)
-DEVALUE_HOTNESS = timedelta(hours=1)
+SEARCH_DEBOUNCE = 30  # seconds
 PERSIST_STORY_VISITS = timedelta(minutes=10)
+# only one flush at a time, or visits could be counted twice
+FLUSH_VISITS_LOCK_TIMEOUT = 5 * 60  # seconds
+# saved flush ids are only needed until their hash is deleted
+KEEP_VISIT_FLUSHES = timedelta(days=7)
+UPDATE_SIMILAR = timedelta(hours=1)
+
+
+def _search_pending_key(pk):
+    return f'search_vector_pending_{pk}'
+
+
+def schedule_search_vector_update(pk):
+    """Update search vector soon. Many saves in a row cause one update."""
+
+    def schedule():
+        pending_key = _search_pending_key(pk)
+        if cache.add(pending_key, True, timeout=SEARCH_DEBOUNCE * 2):
+            update_search_vector_task.apply_async(
+                (pk, ), countdown=SEARCH_DEBOUNCE
+            )
+
+    # nothing is scheduled if the transaction is rolled back
+    transaction.on_commit(schedule)
+
+
+@shared_task(ignore_result=True)
+def update_search_vector_task(pk):
+    """Update database search index for a single story."""
+    cache.delete(_search_pending_key(pk))
+    return Story.objects.filter(pk=pk).update_search_vector()
 
 
 @periodic_task(run_every=UPDATE_SEARCH, ignore_result=True)
 def update_search_task():
-    """Update database search index for newly modified stories."""
-    qs = Story.objects.filter(
-        Q(search_vector=None)
-        | Q(modified__gt=timezone.now() - UPDATE_SEARCH * 1.5)
-    )
-    qs.update_search_vector()
-    return qs.count()
+    """Update database search index for stories that have been missed.
+    Stories are updated on save, and code that changes searchable fields
+    without `save()` must update their search vectors itself."""
+    return Story.objects.filter(search_vector=None).update_search_vector()
+
+
+@periodic_task(run_every=UPDATE_SIMILAR, ignore_result=True)
+def update_similar_stories_task():
+    """Find similar stories for new and changed published stories."""
+    return update_similar_stories(missing=True)
 
 
 @periodic_task(run_every=crontab(hour=6, minute=0))
@@ -64,24 +102,51 @@ def upload_storyimages(pk):
 @periodic_task(run_every=PERSIST_STORY_VISITS, ignore_result=True)
 def save_visits_task():
     """Persist visit counts to database and reset cache."""
-    cache_keys = cache.keys(f'{Story.VISIT_KEY_PREFIX}*')
-    for key in cache_keys:
-        val = int(cache.get(key))
-        pk = int(key.replace(Story.VISIT_KEY_PREFIX, ''))
-
-        Story.objects.filter(pk=pk).update(
-            hit_count=F('hit_count') + val,
-            hot_count=F('hot_count') + 100 * val,
-        )
-        logger.info(f'Story {pk} was visited {val} times')
-        cache.delete(key)
-    return len(cache_keys)
-
-
-@periodic_task(run_every=DEVALUE_HOTNESS, ignore_result=True)
-def devalue_hotness_task(chill_percentage=1):
-    """Decrease the hotness rating of all stories."""
-    factor = (100 - chill_percentage) / 100.0
-    logger.info(f'decreasing hotness by {factor}%')
-    Story.objects.devalue_hotness(factor)
-    return chill_percentage
+    lock = CacheLock('save_visits_task', FLUSH_VISITS_LOCK_TIMEOUT)
+    with lock as acquired:
+        if not acquired:
+            logger.info('visits are already being saved')
+            return 0
+        return _flush_visits()
+
+
+def _flush_visits():
+    redis = get_redis_connection()
+    flushing = f'{Story.VISITS_KEY}:flushing:'
+    count = 0
+    for key in redis.scan_iter(f'{flushing}*'):
+        # A previous flush failed, and its visits might not be saved.
+        logger.warning('saving visits left over from a failed flush')
+        count += _save_visits(redis, key)
+    # Swap out the hash atomically, so no new visits are lost.
+    key = f'{flushing}{uuid.uuid4().hex}'
+    try:
+        redis.rename(Story.VISITS_KEY, key)
+    except ResponseError:
+        return count  # no visits since last time
+    return count + _save_visits(redis, key)
+
+
+def _save_visits(redis, key):
+    """Add visits in a flushing hash to the database, unless they already
+    have been, and delete the hash."""
+    if isinstance(key, bytes):
+        key = key.decode()
+    flush_id = key.rsplit(':', 1)[-1]
+    visits = {
+        int(pk): int(count)
+        for pk, count in redis.hgetall(key).items()
+    }
+    with transaction.atomic():
+        _, created = VisitFlush.objects.get_or_create(flush_id=flush_id)
+        if created:
+            Story.objects.add_visits(visits)
+        VisitFlush.objects.filter(
+            created__lt=timezone.now() - KEEP_VISIT_FLUSHES
+        ).delete()
+    redis.delete(key)
+    if not created:
+        logger.warning(f'visits in flush {flush_id} were already saved')
+        return 0
+    logger.info(f'{sum(visits.values())} visits to {len(visits)} stories')
+    return len(visits)
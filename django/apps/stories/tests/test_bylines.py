@@ -0,0 +1,41 @@
+import pytest
+
+from apps.contributors.models import Contributor
+from apps.stories.models import Byline, Story
+from apps.stories.models.byline import clean_up_bylines, normalize_credit
+
+
+def test_clean_up_bylines():
+    assert clean_up_bylines('Tekst: Jane Doe; Foto: John Smith') == (
+        'text: Jane Doe\nphoto: John Smith'
+    )
+    assert clean_up_bylines('Jane Doe (foto)') == 'photo: Jane Doe'
+
+
+def test_normalize_credit():
+    assert normalize_credit('photo') == 'photo'
+    assert normalize_credit('phot') == 'photo'
+    assert normalize_credit('???') == Byline.DEFAULT_CREDIT
+
+
+@pytest.mark.django_db
+def test_create_bylines_for_stories(django_assert_num_queries):
+    jane = Contributor.objects.create(display_name='Jane Doe')
+    stories = [Story.objects.create(title=f'Story {n}') for n in range(3)]
+    raw_bylines = [(story, 'Tekst: Jane Doe; Foto: Jane Doe')
+                   for story in stories]
+    # contributors, bulk create bylines
+    with django_assert_num_queries(2):
+        bylines = Byline.objects.create_for_stories(raw_bylines)
+    assert len(bylines) == 6
+    assert {byline.contributor for byline in bylines} == {jane}
+    assert [byline.credit for byline in bylines[:2]] == ['text', 'photo']
+
+
+@pytest.mark.django_db
+def test_create_malformed_bylines_for_stories():
+    story = Story.objects.create(title='Story')
+    Byline.objects.create_for_stories([(story, 'Tekst: Aa Bb Cc Dd Ee Ff')])
+    story.refresh_from_db()
+    assert story.publication_status == Story.STATUS_ERROR
+    assert 'Malformed byline' in story.comment
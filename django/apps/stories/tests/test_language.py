@@ -0,0 +1,47 @@
+import pytest
+
+from apps.stories.language import guess_language, guess_languages
+from apps.stories.models import Story
+
+BOKMAL = 'Hun sa at hun ikke bare kom fra byen.'
+NYNORSK = 'Ho sa at ho ikkje berre kom frå byen.'
+ENGLISH = 'She said that she was not only from the city.'
+
+
+def test_guess_language():
+    assert guess_language(BOKMAL) == 'nb'
+    assert guess_language(NYNORSK) == 'nn'
+    assert guess_language(ENGLISH) == 'en'
+    assert guess_language('Lorem ipsum', default='xx') == 'xx'
+
+
+@pytest.mark.django_db
+def test_guess_language_on_create():
+    story = Story.objects.create(title='Hello', bodytext_markup=ENGLISH)
+    assert story.language == 'en'
+    story.bodytext_markup = NYNORSK
+    story.save()
+    assert story.language == 'en'
+
+
+@pytest.mark.django_db
+def test_guess_languages():
+    stories = [
+        Story.objects.create(title=f'Story {n}', bodytext_markup=BOKMAL)
+        for n in range(3)
+    ]
+    Story.objects.filter(pk=stories[1].pk).update(bodytext_markup=NYNORSK)
+    changed = list(guess_languages(batch_size=2))
+    assert changed == [(stories[1].pk, 'nn')]
+    assert Story.objects.get(pk=stories[1].pk).language == 'nn'
+
+
+@pytest.mark.django_db
+def test_guess_languages_updates_search_vector():
+    story = Story.objects.create(title='Story', bodytext_markup=BOKMAL)
+    Story.objects.filter(pk=story.pk).update(bodytext_markup=ENGLISH)
+    Story.objects.update_search_vector()
+    assert list(guess_languages()) == [(story.pk, 'en')]
+    story.refresh_from_db()
+    # stemmed with the english config
+    assert "'citi'" in story.search_vector
@@ -0,0 +1,75 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import threading
+import time
+
+import pytest
+
+from apps.stories.link_checker import HostRateLimiter, LinkChecker
+from apps.stories.models import InlineLink, Story
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    statuses = {'/ok': 200, '/missing': 404, '/gone': 410, '/error': 503}
+
+    def respond(self):
+        status = self.statuses.get(self.path, 404)
+        if status == 410 and self.command == 'GET':
+            status = 200
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_GET = respond
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_host_rate_limiter():
+    limiter = HostRateLimiter(0.05)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.wait('example.com')
+    limiter.wait('example.org')
+    assert 0.1 <= time.monotonic() - start < 0.5
+
+
+@pytest.mark.django_db
+def test_link_checker(stub_server):
+    story = Story.objects.create(title='Links')
+    other = Story.objects.create(title='Other')
+    paths = ['/ok', '/missing', '/gone', '/error']
+    links = [
+        InlineLink.objects.create(
+            parent_story=story, number=n, href=f'{stub_server}{path}'
+        ) for n, path in enumerate(paths, 1)
+    ]
+    links.append(
+        InlineLink.objects.create(
+            parent_story=story, number=9, linked_story=other
+        )
+    )
+    checker = LinkChecker(workers=4, host_interval=0, batch_size=2)
+    assert checker.check_links(story.inline_links.order_by('pk')) == 5
+    statuses = story.inline_links.order_by('pk').values_list(
+        'status_code', flat=True
+    )
+    assert list(statuses) == ['200', '404', '200', '500', 'INT']
+    # nothing changed the second time
+    assert checker.check_links(story.inline_links.all()) == 0
@@ -0,0 +1,104 @@
+"""Tests for inline links"""
+
+import os
+import time
+
+import pytest
+
+from apps.stories.models import InlineLink, Story
+
+
+def render_each(links, text):
+    """Reference implementation, replacing one link at a time."""
+    for link in links:
+        text = link.markup_to_html(text)
+    return text
+
+
+@pytest.fixture
+def story_with_links():
+    story = Story.objects.create(title='Long read')
+    other = Story.objects.create(title='Other story')
+    paragraphs = []
+    for number in range(1, 61):
+        link = InlineLink(
+            parent_story=story,
+            number=number,
+            text=f'link number {number}',
+        )
+        if number % 3:
+            link.href = f'https://example.com/{number}/'
+        else:
+            link.linked_story = other
+        link.save()
+        paragraphs.append(
+            f'Lorem ipsum dolor sit amet [{number}] {link.get_tag()}. ' * 20
+        )
+    story.bodytext_markup = '\n\n'.join(paragraphs)
+    return story
+
+
+@pytest.mark.django_db
+def test_render_links(story_with_links, django_assert_num_queries):
+    """Single pass rendering of a long story with 60 links"""
+    story = story_with_links
+    text = story.bodytext_markup
+    links = list(story.inline_links.select_related('linked_story'))
+    assert len(links) == 60
+    expected = render_each(links, text)
+    with django_assert_num_queries(1):
+        assert story.inline_links.markup_to_html(text) == expected
+    other = Story.objects.get(title='Other story')
+    html = story.inline_links.markup_to_html('See [link number 3](3).')
+    assert html == (
+        f'See <a href="{other.get_absolute_url()}" alt="">link number 3</a>.'
+    )
+
+
+@pytest.mark.skipif(
+    not os.environ.get('BENCHMARK'),
+    reason='benchmark, run with BENCHMARK=1 pytest -s -k benchmark',
+)
+@pytest.mark.django_db
+def test_benchmark_render_links(story_with_links):
+    story = story_with_links
+    text = story.bodytext_markup
+    links = list(story.inline_links.select_related('linked_story'))
+    rounds = 20
+    start = time.perf_counter()
+    for _ in range(rounds):
+        render_each(links, text)
+    each = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        story.inline_links.markup_to_html(text)
+    single = (time.perf_counter() - start) / rounds
+    print(
+        f'\n{len(links)} links: one at a time {each * 1000:.1f}ms, '
+        f'single pass {single * 1000:.1f}ms'
+    )
+    assert single < each
+
+
+@pytest.mark.django_db
+def test_clean_and_create_links(django_assert_num_queries):
+    story = Story.objects.create(title='Long read')
+    other = Story.objects.create(title='Other story')
+    old = InlineLink.objects.create(parent_story=story, number=1, text='old')
+    internal = f'http://universitas.no/nyheter/{other.pk}/other-story/'
+    body = (
+        '[first](1) and [external](https://example.com/) and '
+        f'[internal]({internal}) and [external](https://example.com/)'
+    )
+    # existing links, internal stories, bulk create, bulk update
+    with django_assert_num_queries(4):
+        body = InlineLink.clean_and_create_links(body, story)
+    assert body == (
+        '[first](1) and [external](2) and [internal](3) and [external](2)'
+    )
+    links = {link.number: link for link in story.inline_links.all()}
+    assert links[1].text == 'first'
+    assert links[1].modified > old.modified
+    assert links[2].href == 'https://example.com/'
+    assert links[3].linked_story == other
+    assert links[3].href == ''
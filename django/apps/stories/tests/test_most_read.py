@@ -0,0 +1,53 @@
+import time
+
+from django_redis import get_redis_connection
+import pytest
+
+from apps.stories import most_read
+from apps.stories.models import Story
+
+HOUR = 60 * 60
+
+
+@pytest.fixture
+def stories():
+    redis = get_redis_connection()
+    for key in redis.keys(f'{most_read.KEY_PREFIX}:*'):
+        redis.delete(key)
+    return [
+        Story.objects.create(
+            title=f'Story {n}', publication_status=Story.STATUS_PUBLISHED
+        ) for n in range(3)
+    ]
+
+
+@pytest.mark.django_db
+def test_most_read_windows(stories):
+    first, second, third = stories
+    now = time.time()
+    most_read.register_visit(first.pk, 5, when=now - 2 * 24 * HOUR)
+    most_read.register_visit(second.pk, 3, when=now - 2 * HOUR)
+    most_read.register_visit(third.pk, 1, when=now)
+
+    assert most_read.top_stories('1h', when=now) == [(third.pk, 1)]
+    assert most_read.top_stories('24h', when=now) == [
+        (second.pk, 3),
+        (third.pk, 1),
+    ]
+    results = most_read.most_read('7d', limit=2, when=now)
+    assert [item['id'] for item in results] == [first.pk, second.pk]
+    assert results[0]['title'] == 'Story 0'
+    assert results[0]['visits'] == 5
+
+
+@pytest.mark.django_db
+def test_deleted_story_is_not_most_read(stories):
+    first, second, third = stories
+    for n, story in enumerate(stories):
+        Story.register_visit_in_cache(story.pk, 3 - n)
+    assert len(most_read.most_read()) == 3
+    second.delete()
+    assert [item['id'] for item in most_read.most_read()] == [
+        first.pk, third.pk
+    ]
+    assert second.pk not in dict(most_read.top_stories())
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+import pytest
+
+from apps.stories.models import Story
+from apps.stories.models.search_mixin import TRIGRAM_THRESHOLD
+
+
+@pytest.fixture
+def stories():
+    return [
+        Story.objects.create(title='Lorem ipsum', lede='dolor sit amet'),
+        Story.objects.create(title='Consectetur', lede='adipiscing elit'),
+    ]
+
+
+@pytest.mark.django_db
+def test_trigram_search(stories):
+    result = Story.objects.trigram_search_rank('lorme ipsum')
+    assert list(result) == stories[:1]
+
+
+@pytest.mark.django_db
+def test_trigram_threshold_is_set_for_connection():
+    with connection.cursor() as cursor:
+        cursor.execute('SHOW pg_trgm.word_similarity_threshold')
+        assert float(cursor.fetchone()[0]) == TRIGRAM_THRESHOLD
+
+
+@pytest.mark.django_db
+def test_trigram_search_uses_index(stories):
+    with connection.cursor() as cursor:
+        # tiny test table would otherwise be scanned sequentially
+        cursor.execute('SET enable_seqscan = off')
+    plan = Story.objects.trigram_search_rank('lorem').explain()
+    assert 'stories_headline_trgm' in plan
+
+
+@pytest.mark.django_db
+def test_search_ranked(stories, django_assert_num_queries):
+    ids = Story.objects.search_ids('lorem ipsum')
+    assert ids == [stories[0].pk]
+    # ranked ids are cached for the normalized query
+    with django_assert_num_queries(0):
+        assert Story.objects.search_ids('  Lorem  IPSUM ') == ids
+    # querysets filtered by the current time share the cached list
+    Story.objects.filter(pk__in=ids).update(
+        publication_status=Story.STATUS_PUBLISHED,
+        publication_date=timezone.now() - timedelta(days=1),
+    )
+    assert Story.objects.published().search_ids('lorem ipsum') == ids
+    with django_assert_num_queries(0):
+        assert Story.objects.published().search_ids('lorem ipsum') == ids
+    result = Story.objects.search_ranked('lorem ipsum')
+    assert [(s.pk, s.search_position, s.search_total) for s in result] == [
+        (stories[0].pk, 0, 1)
+    ]
+
+
+@pytest.mark.django_db
+def test_search_ranks_newest_candidates(stories):
+    newest = Story.objects.create(title='Lorem ipsum', lede='dolor sit amet')
+    Story.objects.update_search_vector()
+    Story.objects.filter(pk=stories[0].pk).update(
+        publication_date=timezone.now() - timedelta(days=7)
+    )
+    Story.objects.filter(pk=newest.pk).update(publication_date=timezone.now())
+    result = Story.objects.search('lorem ipsum', candidates=1)
+    assert list(result) == [newest]
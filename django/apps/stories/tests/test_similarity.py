@@ -0,0 +1,57 @@
+import pytest
+
+from apps.stories.models import Story
+from apps.stories.similarity import (
+    parse_tsvector,
+    similar_documents,
+    update_similar_stories,
+)
+
+
+def test_parse_tsvector():
+    # position 2 has the default weight D, and position 4 has weight C
+    assert parse_tsvector("'fat':2,4C 'it''s' 'cat':3A") == pytest.approx({
+        'fat': 0.3,
+        "it's": 0.1,
+        'cat': 1.0,
+    })
+    assert parse_tsvector(None) == {}
+
+
+def test_similar_documents():
+    documents = [
+        {'katt': 1, 'hund': 1},
+        {'katt': 1, 'hund': 1, 'fisk': 1},
+        {'bil': 1, 'buss': 1},
+        {'buss': 1, 'tog': 1},
+        {'sykkel': 1},
+    ]
+    assert similar_documents(documents, number=2) == {
+        0: [1],
+        1: [0],
+        2: [3],
+        3: [2],
+        4: [],
+    }
+    assert similar_documents(documents, rows=[2], processes=2) == {2: [3]}
+
+
+@pytest.mark.django_db
+def test_update_similar_stories_incrementally():
+    def publish(title, lede):
+        return Story.objects.create(
+            title=title, lede=lede, publication_status=Story.STATUS_PUBLISHED
+        )
+
+    cats = publish('Katter og hunder', 'katter hunder fisker')
+    publish('Biler og busser', 'biler busser tog')
+    Story.objects.update_search_vector()
+    assert update_similar_stories(missing=True) == 2
+    assert update_similar_stories(missing=True) == 0
+
+    # the new story and the older story it is similar to
+    dogs = publish('Hunder og katter', 'hunder katter')
+    Story.objects.update_search_vector()
+    assert update_similar_stories(missing=True) == 2
+    cats.refresh_from_db()
+    assert cats.similar_stories == [dogs.pk]
@@ -1,7 +1,18 @@
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
 import pytest
 
-from apps.stories.models import Story
-from apps.stories.tasks import upload_storyimages
+from apps.stories.models import Story, VisitFlush
+from apps.stories.tasks import (
+    _search_pending_key,
+    save_visits_task,
+    schedule_search_vector_update,
+    update_search_task,
+    update_search_vector_task,
+    upload_storyimages,
+)
+from utils.cache_lock import CacheLock
 
 
 @pytest.fixture
@@ -12,3 +23,82 @@ def story():
 @pytest.mark.django_db
 def test_upload_task(story):
     assert 'Baksiden' in upload_storyimages(story.pk)
+
+
+@pytest.mark.django_db
+def test_save_visits_task(story):
+    save_visits_task()  # flush leftovers
+    Story.register_visit_in_cache(story.pk)
+    Story.register_visit_in_cache(story.pk, 2)
+    assert save_visits_task() == 1
+    story.refresh_from_db()
+    assert story.hit_count == 3
+    # hotness decays very little during the test
+    assert 1299 < story.hot_count <= 1300
+    assert save_visits_task() == 0
+
+
+@pytest.mark.django_db
+def test_save_visits_one_flush_at_a_time(story):
+    save_visits_task()  # flush leftovers
+    Story.register_visit_in_cache(story.pk)
+    with CacheLock('save_visits_task', 10):
+        assert save_visits_task() == 0
+    assert save_visits_task() == 1
+    story.refresh_from_db()
+    assert story.hit_count == 1
+
+
+@pytest.mark.django_db
+def test_save_visits_left_over_only_once(story):
+    save_visits_task()  # flush leftovers
+    redis = get_redis_connection()
+    flushing = f'{Story.VISITS_KEY}:flushing'
+    # crashed after the visits were saved, and before the hash was deleted
+    redis.hset(f'{flushing}:saved', story.pk, 5)
+    VisitFlush.objects.create(flush_id='saved')
+    # crashed before the visits were saved
+    redis.hset(f'{flushing}:unsaved', story.pk, 2)
+    assert save_visits_task() == 1
+    story.refresh_from_db()
+    assert story.hit_count == 2
+    assert not list(redis.scan_iter(f'{flushing}:*'))
+
+
+@pytest.mark.django_db
+def test_update_search_vector(story):
+    story = Story.objects.get(pk=story.pk)
+    assert story.search_vector is None
+    assert not story.search_fields_changed()
+    story.comment = 'not in search vector'
+    assert not story.search_fields_changed()
+    story.lede = 'dolor sit amet'
+    assert story.search_fields_changed()
+
+    assert update_search_vector_task(story.pk) == 1
+    story.refresh_from_db()
+    assert story.search_vector
+
+
+@pytest.mark.django_db
+def test_update_search_sweeps_missing_vectors(story):
+    update_search_task()
+    indexed = Story.objects.create(title='Indexed', lede='dolor sit amet')
+    update_search_vector_task(indexed.pk)
+    Story.objects.filter(pk=story.pk).update(search_vector=None)
+    # recently saved stories with a search vector are not updated again
+    assert update_search_task() == 1
+    story.refresh_from_db()
+    assert 'ipsum' in story.search_vector
+
+
+@pytest.mark.django_db
+def test_schedule_search_update_after_rollback(story):
+    cache.delete(_search_pending_key(story.pk))
+    try:
+        with transaction.atomic():
+            schedule_search_vector_update(story.pk)
+            raise RuntimeError('rollback')
+    except RuntimeError:
+        pass
+    assert cache.get(_search_pending_key(story.pk)) is None
@@ -15,6 +15,8 @@ redis_port = env.redis_port or 6379
 TASSEN_DESKEN_LOGIN = env.desken_login
 TASSEN_DESKEN_PATH = env.desken_path
 EXPRESS_SERVER_URL = 'http://express:9000'
+# internal nginx server used to refresh cached pages
+NGINX_CACHE_URL = env.nginx_cache_url or ''
 
 DEBUG = True if env.debug.lower() == 'true' else False
 TEMPLATE_DEBUG = DEBUG
@@ -147,6 +149,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'utils.bot_middleware.BotDetectionMiddleware',
+    'utils.surrogate_key_middleware.SurrogateKeyMiddleware',
 ]
 
 WSGI_APPLICATION = 'universitas.wsgi.application'
@@ -178,6 +182,11 @@ DATABASES = {
         'PASSWORD': env.pg_password or 'postgres',
         'HOST': env.pg_host or 'postgres',
         'PORT': env.pg_port or '',  # Set to empty string for default.
+        'OPTIONS': {
+            # Cutoff for indexed trigram lookups, same as TRIGRAM_THRESHOLD
+            # in apps/stories/models/search_mixin.py
+            'options': '-c pg_trgm.word_similarity_threshold=0.5',
+        },
     }
 }
 # CACHE
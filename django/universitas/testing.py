@@ -12,3 +12,4 @@ DEFAULT_FILE_STORAGE = 'utils.local_file_storage.OverwriteStorage'
 FILE_UPLOAD_TEMP_DIR = tempfile.mkdtemp(prefix='djangotest_')
 MEDIA_ROOT = tempfile.mkdtemp(prefix='djangotest_')
 STATIC_ROOT = tempfile.mkdtemp(prefix='djangotest_')
+NGINX_CACHE_URL = ''
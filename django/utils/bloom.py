@@ -0,0 +1,72 @@
+"""Probabilistic set membership in redis bitmaps"""
+
+import hashlib
+import time
+
+from django_redis import get_redis_connection
+
+
+class RotatingBloomFilter:
+    """Bloom filter that forgets items after a while.
+
+    Items are added to a filter for the current time window, and looked up
+    in the filters for both the current and the previous window. So an item
+    is remembered for between one and two window lengths, and old filters
+    simply expire. Adding and checking an item is a single round trip.
+
+    False positives are possible, false negatives are not. The false
+    positive rate for each window is about `(1 - exp(-k * n / m)) ** k`,
+    where `n` is the number of items added in the window, `m` is the number
+    of bits and `k` is the number of hash functions. With the defaults,
+    2**20 bits (128 KiB per window) and 7 hash functions:
+
+    ==================  ====================
+    items per window    false positive rate
+    ==================  ====================
+    20 000              0.00005 %
+    50 000              0.015 %
+    100 000             0.65 %
+    ==================  ====================
+
+    Since two windows are checked, the effective rate is up to twice that.
+    """
+
+    def __init__(self, name, window, bits=2**20, hashes=7, connection=None):
+        self.name = name
+        self.window = window
+        self.bits = bits
+        self.hashes = hashes
+        self._connection = connection
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = get_redis_connection()
+        return self._connection
+
+    def _key(self, when):
+        return f'bloom:{self.name}:{int(when // self.window)}'
+
+    def _positions(self, item):
+        """Bit positions for item, using double hashing"""
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, item, when=None):
+        """Add item to filter. Returns True if the item was probably added
+        recently, and False if it certainly was not."""
+        when = time.time() if when is None else when
+        current, previous = self._key(when), self._key(when - self.window)
+        positions = self._positions(item)
+        pipe = self.connection.pipeline(transaction=False)
+        for position in positions:
+            pipe.setbit(current, position, 1)
+        for position in positions:
+            pipe.getbit(previous, position)
+        pipe.expire(current, 2 * self.window)
+        bits = pipe.execute()
+        in_current = all(bits[:self.hashes])
+        in_previous = all(bits[self.hashes:2 * self.hashes])
+        return in_current or in_previous
@@ -0,0 +1,12 @@
+from .bots import is_bot
+
+
+class BotDetectionMiddleware:
+    """Set `request.is_bot` for requests from web crawlers and other bots"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.is_bot = is_bot(request.META.get('HTTP_USER_AGENT', ''))
+        return self.get_response(request)
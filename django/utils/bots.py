@@ -0,0 +1,36 @@
+"""Detect web crawlers and other bots from user agent strings."""
+
+from functools import lru_cache
+from pathlib import Path
+import re
+
+BOTLIST = Path(__file__).parent / 'botlist.txt'
+
+# Generic words that most crawlers have in their user agent.
+GENERIC_SIGNATURES = ['bot', 'spider', 'crawler', 'yahoo']
+
+
+def load_signatures(path=BOTLIST):
+    """Read list of lower case bot signatures from file."""
+    lines = Path(path).read_text().splitlines()
+    signatures = [line.strip().strip(',').strip('\'"') for line in lines]
+    return [signature.lower() for signature in signatures if signature]
+
+
+def compile_signatures(signatures):
+    """Single regular expression matching any of the signatures."""
+    # Longest first, so a shared prefix doesn't hide a longer signature.
+    unique = sorted(set(signatures), key=len, reverse=True)
+    return re.compile('|'.join(re.escape(signature) for signature in unique))
+
+
+BOT_PATTERN = compile_signatures(GENERIC_SIGNATURES + load_signatures())
+
+
+@lru_cache(maxsize=1024)
+def is_bot(user_agent):
+    """Check if user agent belongs to a bot. A missing user agent means
+    that the visitor is not using a web browser."""
+    if not user_agent:
+        return True
+    return BOT_PATTERN.search(user_agent.lower()) is not None
@@ -0,0 +1,61 @@
+"""Locks in the shared cache, which can only be released by their owner."""
+
+import uuid
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+# Delete the lock only if it still holds our token.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class CacheLock:
+    """Lock held by one caller at a time. The lock expires after `timeout`
+    seconds, in case the owner never releases it.
+
+    Usage::
+
+        with CacheLock('flush_visits', 60) as acquired:
+            if acquired:
+                ...
+    """
+
+    def __init__(self, key, timeout):
+        self.key = key
+        self.timeout = timeout
+        self.token = None
+
+    def acquire(self):
+        """Take the lock if it's free. Returns True if we hold it."""
+        token = uuid.uuid4().hex
+        connection = get_redis_connection()
+        if connection.set(self._key, token, nx=True, ex=self.timeout):
+            self.token = token
+        return self.token is not None
+
+    def release(self):
+        """Release the lock, unless it has expired and been taken by
+        someone else. Returns True if our lock was released."""
+        if self.token is None:
+            return False
+        connection = get_redis_connection()
+        released = connection.register_script(RELEASE_SCRIPT)(
+            keys=[self._key], args=[self.token]
+        )
+        self.token = None
+        return bool(released)
+
+    @property
+    def _key(self):
+        return cache.make_key(self.key)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,178 @@
+"""Tag based invalidation of cache entries.
+
+A cache entry is tagged with the model instances that were loaded from the
+database while it was computed. Each tag is a redis set of the cache keys
+that depend on it, so saving an instance purges all of them with a single
+script call. A tagged entry is itself a tag, so entries built from other
+cached entries, such as a page that includes a cached api payload, are
+purged along with them.
+"""
+
+from contextlib import contextmanager
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal
+from django_redis import get_redis_connection
+
+TAG_PREFIX = 'cachetags:'
+# Used when the tagged entry never expires.
+TAG_TIMEOUT = 30 * 24 * 60 * 60
+
+# Add key to each tag set, and keep the sets around as long as the key.
+TAG_SCRIPT = """
+local timeout = tonumber(ARGV[2])
+for _, tag in ipairs(KEYS) do
+    redis.call('SADD', tag, ARGV[1])
+    if redis.call('TTL', tag) < timeout then
+        redis.call('EXPIRE', tag, timeout)
+    end
+end
+"""
+
+# Delete tagged keys, and everything tagged with those keys in turn.
+PURGE_SCRIPT = """
+local queue, seen, purged = KEYS, {}, 0
+local n = 1
+while n <= #queue do
+    local tag = queue[n]
+    n = n + 1
+    if not seen[tag] then
+        seen[tag] = true
+        local keys = redis.call('SMEMBERS', tag)
+        redis.call('DEL', tag)
+        for _, key in ipairs(keys) do
+            purged = purged + redis.call('DEL', key)
+            queue[#queue + 1] = ARGV[1] .. key
+        end
+    end
+end
+return purged
+"""
+
+_local = threading.local()
+
+# Sent when tags are purged because of a committed change in a tracked model.
+tags_purged = Signal(providing_args=['tags'])
+
+
+def model_tag(model):
+    """Tag for entries that list instances of a model"""
+    return model._meta.label_lower
+
+
+def instance_tag(instance):
+    return f'{instance._meta.label_lower}:{instance.pk}'
+
+
+def entry_tag(key):
+    """Tag for entries that include the cache entry with this key"""
+    return cache.make_key(key)
+
+
+def _collectors():
+    if not hasattr(_local, 'collectors'):
+        _local.collectors = []
+    return _local.collectors
+
+
+@contextmanager
+def collect_tags(merge=True):
+    """Collect tags of tracked model instances loaded in this block. Tags
+    are also added to the enclosing block, unless `merge` is False."""
+    tags = set()
+    collectors = _collectors()
+    collectors.append(tags)
+    try:
+        yield tags
+    finally:
+        collectors.pop()
+        if merge and collectors:
+            collectors[-1].update(tags)
+
+
+def add_tags(*tags):
+    collectors = _collectors()
+    if collectors:
+        collectors[-1].update(tags)
+
+
+class CacheTags:
+    """Redis sets of cache keys by tag"""
+
+    def __init__(self, connection=None):
+        self._connection = connection
+        self._scripts = {}
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = get_redis_connection()
+        return self._connection
+
+    def _script(self, source):
+        if source not in self._scripts:
+            self._scripts[source] = self.connection.register_script(source)
+        return self._scripts[source]
+
+    def tag(self, key, tags, timeout=None):
+        """Purge cache entry `key` when any of the tags are purged."""
+        if not tags:
+            return
+        self._script(TAG_SCRIPT)(
+            keys=[TAG_PREFIX + tag for tag in tags],
+            args=[cache.make_key(key), timeout or TAG_TIMEOUT],
+        )
+
+    def purge(self, *tags):
+        """Delete all cache entries with any of the tags. Returns the number
+        of deleted entries."""
+        if not tags:
+            return 0
+        return self._script(PURGE_SCRIPT)(
+            keys=[TAG_PREFIX + tag for tag in tags],
+            args=[TAG_PREFIX],
+        )
+
+    def set(self, key, value, timeout, tags):
+        cache.set(key, value, timeout)
+        self.tag(key, tags, timeout)
+
+
+cache_tags = CacheTags()
+
+
+def purge_on_commit(sender, tags):
+    """Purge tags once the current transaction is committed. Purging before
+    that would let concurrent requests cache the old data again."""
+
+    def purge():
+        cache_tags.purge(*tags)
+        tags_purged.send(sender=sender, tags=tags)
+
+    transaction.on_commit(purge)
+
+
+def _collect_instance(sender, instance, **kwargs):
+    if instance.pk is not None:
+        add_tags(instance_tag(instance))
+
+
+def _purge_instance(sender, instance, created=False, **kwargs):
+    tags = [instance_tag(instance)]
+    if created or kwargs.get('signal') is post_delete:
+        tags.append(model_tag(sender))
+    purge_on_commit(sender, tags)
+
+
+def track_models(*models):
+    """Tag entries with loaded instances of these models, and purge them
+    when the instances are saved or deleted. Creating or deleting an
+    instance also purges entries tagged with the model."""
+    for model in models:
+        uid = f'cache_tags_{model._meta.label_lower}'
+        post_init.connect(_collect_instance, sender=model, dispatch_uid=uid)
+        post_save.connect(_purge_instance, sender=model, dispatch_uid=uid)
+        post_delete.connect(_purge_instance, sender=model, dispatch_uid=uid)
@@ -1,4 +1,4 @@
-from django.db.models import FloatField, Func, Value
+from django.db.models import FloatField, Func, Lookup, Value
 
 
 class TrigramWordSimilarity(Func):
@@ -11,6 +11,18 @@ class TrigramWordSimilarity(Func):
         super().__init__(string, expression, **extra)
 
 
+class TrigramWordSimilar(Lookup):
+    """Word similarity operator. Unlike the WORD_SIMILARITY function, this can
+    use a trigram index. The cutoff is the database setting
+    `pg_trgm.word_similarity_threshold`"""
+    lookup_name = 'trigram_word_similar'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} %%> {rhs}', lhs_params + rhs_params
+
+
 class LogAge(Func):
     """Calculate log 2 of days since datetime column"""
     # Minimum age 1 day. Prevent log of zero error and unintended large
@@ -1,15 +1,27 @@
 # forked from https://github.com/peterbe/django-cache-memoize
+from collections import OrderedDict
 from functools import wraps
 import hashlib
 import inspect
 import logging
+import math
+import random
+import threading
 import time
 
 from django.core.cache import cache
 from django.utils.encoding import force_bytes, force_text
 
+from utils.cache_lock import CacheLock
+from utils.cache_tags import add_tags, cache_tags, collect_tags, entry_tag
+
 logger = logging.getLogger('apps')
 
+# instance attribute for results from `get_many()`
+PREFETCHED_ATTR = '_cache_memoize_prefetched'
+# seconds between checks for invalidation of in-process results
+LOCAL_VERSION_TIMEOUT = 1
+
 
 def timeit(fn):
     @wraps(fn)
@@ -34,6 +46,44 @@ def _ismethod(func):
         return False
 
 
+class _LocalCache:
+    """Bounded in-process cache with least recently used eviction and a
+    fixed time to live for every entry."""
+
+    def __init__(self, timeout, maxsize):
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
 def cache_memoize(
     timeout=24 * 60 * 60,
     prefix=None,
@@ -41,6 +91,12 @@ def cache_memoize(
     hit_callable=None,
     miss_callable=None,
     store_result=True,
+    lock_timeout=None,
+    stale_timeout=None,
+    beta=1.0,
+    local_timeout=None,
+    local_maxsize=1000,
+    tagged=False,
 ):
     """Decorator for memoizing function calls where we use the
     "local cache" to store the result.
@@ -54,6 +110,20 @@ def cache_memoize(
     :arg function miss_callable: Gets executed if key was *not* in cache.
     :arg bool store_result: If you know the result is not important, just
     that the cache blocked it from running repeatedly, set this to False.
+    :arg int lock_timeout: Enable stampede protection. Only one caller at a
+    time recomputes an expired result, holding a cache lock for at most this
+    many seconds, while other callers are served the stale result.
+    :arg int stale_timeout: With stampede protection, number of seconds an
+    expired result is kept around to be served stale. Defaults to `timeout`.
+    :arg float beta: With stampede protection, refresh results
+    probabilistically before they expire. Higher values refresh earlier,
+    0 disables early refresh.
+    :arg int local_timeout: Keep results in an in-process cache for this many
+    seconds as well, to save round trips to the shared cache. Invalidation
+    from other processes is checked at most once a second.
+    :arg int local_maxsize: Maximum number of results in the in-process cache.
+    :arg bool tagged: Tag results with the tracked model instances used to
+    compute them, so they are purged when those change. See `cache_tags`.
 
     Usage::
 
@@ -89,6 +159,41 @@ def cache_memoize(
         callmeonce.invalidate('peter')
         callmeonce('peter')  # will print 'peter'
 
+    To invalidate every cached result of the function at once, call
+    `invalidate_all()`. This bumps a generation counter, which is stored
+    along with every result and checked when it's read, in the same round
+    trip. It costs a single cache operation no matter how many results have
+    been stored, and results from earlier generations are misses::
+
+        callmeonce('peter')  # will print 'peter'
+        callmeonce('paul')   # will print 'paul'
+        callmeonce.invalidate_all()
+        callmeonce('peter')  # will print 'peter'
+
+    Hot results that are expensive to compute can be protected from cache
+    stampedes, where many concurrent callers find the result expired and
+    all recompute it at the same time::
+
+        @cache_memoize(60 * 30, lock_timeout=10)
+        def fetch_newsfeed(request):
+            ...
+
+    Small results that are read very often can be kept in an in-process
+    cache in front of the shared cache. Local results are dropped when the
+    function is invalidated in any process, which is checked once a second::
+
+        @cache_memoize(60 * 5, local_timeout=30)
+        def thumb(self):
+            ...
+
+    Results that are built from model instances can be tagged with them,
+    and are then purged when any of the instances is saved. Cached pages
+    that include a tagged result are purged along with it::
+
+        @cache_memoize(60 * 30, tagged=True)
+        def fetch_issues(request):
+            ...
+
     Suppose you know for good reason you want to bypass the cache and
     really let the decorator let you through you can set one extra
     keyword argument called `_refresh`. For example::
@@ -101,6 +206,13 @@ def cache_memoize(
         callmeonce('peter')                 # nothing printed
         callmeonce('peter', _refresh=True)  # will print 'peter'
 
+    Results of a memoized method for many instances can be fetched with a
+    single cache lookup. The results are also attached to the instances,
+    so that calling the method afterwards doesn't hit the cache again::
+
+        thumbs = Contributor.thumb.get_many(contributors)
+        contributors[0].thumb()  # no cache lookup
+
     """
 
     def _funcargs_rewrite(*args):
@@ -115,9 +227,10 @@ def cache_memoize(
             return [self, *args]
 
     def decorator(func):
+        is_method = _ismethod(func)
         rewrite = args_rewrite
         if rewrite is None:
-            if _ismethod(func):
+            if is_method:
                 rewrite = _methodargs_rewrite
             else:
                 rewrite = _funcargs_rewrite
@@ -126,49 +239,302 @@ def cache_memoize(
             name = f'{func.__module__}.{func.__qualname__}'
             return f'cache_memoize:{prefix or name}:'
 
-        def _make_cache_key(*args, **kwargs):
+        def _make_generation_key():
+            return f'{_make_prefix()}generation'
+
+        def _make_invalidations_key():
+            return f'{_make_prefix()}invalidations'
+
+        local = versions = None
+        if local_timeout:
+            local = _LocalCache(local_timeout, local_maxsize)
+            versions = _LocalCache(LOCAL_VERSION_TIMEOUT, 1)
+
+        def _read(cache_keys):
+            """Current generation and the cached values stored under it, in a
+            single round trip. Values from earlier generations are misses."""
+            (generation, _), values = _read_versioned(cache_keys)
+            return generation, values
+
+        def _read_versioned(cache_keys):
+            """Like `_read()`, with the version that local results must match,
+            which is the generation and the number of single invalidations."""
+            generation_key = _make_generation_key()
+            invalidations_key = _make_invalidations_key()
+            keys = [*cache_keys, generation_key]
+            if local:
+                keys.append(invalidations_key)
+            found = cache.get_many(keys)
+            generation = found.pop(generation_key, None)
+            if generation is None:
+                generation = _seed_generation(generation_key)
+            version = (generation, found.pop(invalidations_key, 0))
+            if local:
+                versions.set('version', version)
+            values = {
+                key: value
+                for key, (value_generation, value) in found.items()
+                if value_generation == generation
+            }
+            return version, values
+
+        def _local_version():
+            """Version of local results, looked up at most once a second."""
+            version = versions.get('version')
+            if version is None:
+                version, _ = _read_versioned([])
+            return version
+
+        def _local_get(cache_key, default=None):
+            entry = local.get(cache_key)
+            if entry is None:
+                return default
+            version, result = entry
+            if version != _local_version():
+                local.delete(cache_key)
+                return default
+            return result
+
+        def _local_set(cache_key, result):
+            local.set(cache_key, (_local_version(), result))
+
+        def _bump(key):
+            """Increment a counter, seeded with a timestamp if it's lost."""
+            try:
+                return cache.incr(key)
+            except ValueError:
+                cache.add(key, int(time.time()), timeout=None)
+                return cache.incr(key)
+
+        def _seed_generation(generation_key):
+            # Seed with a timestamp, so that a lost counter never
+            # resurrects results stored under an earlier generation.
+            cache.add(generation_key, int(time.time()), timeout=None)
+            return cache.get(generation_key)
+
+        def _make_digest(*args, **kwargs):
             pfx = _make_prefix()
             cache_key = ':'.join(
                 [force_text(x) for x in rewrite(*args, **kwargs)] +
                 [force_text(f'{k}={v}') for k, v in kwargs.items()]
             )
-            digest = hashlib.md5(force_bytes(pfx + cache_key)).hexdigest()
-            return f'{pfx}{digest}'
+            return hashlib.md5(force_bytes(pfx + cache_key)).hexdigest()
+
+        def _make_cache_key(*args, **kwargs):
+            return f'{_make_prefix()}{_make_digest(*args, **kwargs)}'
+
+        def _make_entry(result, duration=0):
+            """Cache value and timeout for a result"""
+            if not store_result:
+                # Then the result isn't valuable/important to store but
+                # we want to store something. Just to remember that
+                # it has be done.
+                result = True
+            if lock_timeout is None:
+                return result, timeout
+            if timeout is None:
+                return (result, math.inf, duration), None
+            stale = timeout if stale_timeout is None else stale_timeout
+            return (result, time.time() + timeout, duration), timeout + stale
+
+        def _store(cache_key, generation, result, duration=0, tags=None):
+            if local:
+                _local_set(cache_key, result)
+            value, entry_timeout = _make_entry(result, duration)
+            cache.set(cache_key, (generation, value), entry_timeout)
+            if tags:
+                cache_tags.tag(cache_key, tags, entry_timeout)
+
+        def _get_prefetched(args, kwargs, default=None):
+            """Result attached to the instance by `get_many()`"""
+            if not is_method or len(args) != 1 or kwargs:
+                return default
+            prefetched = getattr(args[0], PREFETCHED_ATTR, {})
+            if not prefetched:
+                return default
+            return prefetched.get(_make_digest(*args), default)
+
+        def _set_prefetched(instance, result):
+            try:
+                prefetched = instance.__dict__.setdefault(PREFETCHED_ATTR, {})
+            except AttributeError:
+                return
+            prefetched[_make_digest(instance)] = result
+
+        def _compute(cache_key, generation, *args, **kwargs):
+            t0 = time.time()
+            tags = None
+            if tagged:
+                # Callers depend on the entry itself, which is tagged
+                # with everything used to compute it.
+                with collect_tags(merge=False) as tags:
+                    result = func(*args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+            _store(cache_key, generation, result, time.time() - t0, tags)
+            if miss_callable:
+                miss_callable(*args, **kwargs)
+            return result
+
+        def _is_fresh(expires, duration):
+            """Probabilistic early expiration ("XFetch"). The closer we are
+            to expiry, and the slower the function, the more likely it is
+            that this caller should refresh the result ahead of time."""
+            jitter = duration * beta * math.log(1 - random.random())
+            return time.time() - jitter < expires
+
+        def _protected(cache_key, refresh, *args, **kwargs):
+            """Look up result, making sure only one caller recomputes it."""
+            lock = CacheLock(f'{cache_key}:lock', lock_timeout)
+            generation, found = _read([cache_key])
+            entry = previous = found.get(cache_key)
+            if refresh:
+                # only a result computed after this call is good enough
+                entry = None
+            if entry is not None:
+                result, expires, duration = entry
+                if _is_fresh(expires, duration):
+                    if local:
+                        _local_set(cache_key, result)
+                    if hit_callable:
+                        hit_callable(*args, **kwargs)
+                    return result
+                if not lock.acquire():
+                    # Someone else is already refreshing. Serve stale.
+                    return result
+            elif not lock.acquire():
+                # Cold cache or refresh. Wait a while for the lock holder to
+                # store a new result, then compute without the lock, leaving
+                # it to its owner.
+                deadline = time.time() + lock_timeout
+                while time.time() < deadline:
+                    time.sleep(0.05)
+                    generation, found = _read([cache_key])
+                    entry = found.get(cache_key)
+                    if entry is not None and (
+                        previous is None or entry[1] > previous[1]
+                    ):
+                        return entry[0]
+            try:
+                return _compute(cache_key, generation, *args, **kwargs)
+            finally:
+                lock.release()
 
         @wraps(func)
         def inner(*args, **kwargs):
             refresh = kwargs.pop('_refresh', False)
-            cache_key = _make_cache_key(*args, **kwargs)
             sentry = object()
-            if refresh:
-                result = sentry
-            else:
-                result = cache.get(cache_key, sentry)
+            if not refresh:
+                result = _get_prefetched(args, kwargs, sentry)
+                if result is not sentry:
+                    return result
+            cache_key = _make_cache_key(*args, **kwargs)
+            if tagged:
+                add_tags(entry_tag(cache_key))
+            if local and not refresh:
+                result = _local_get(cache_key, sentry)
+                if result is not sentry:
+                    if hit_callable:
+                        hit_callable(*args, **kwargs)
+                    return result
+            if lock_timeout is not None:
+                return _protected(cache_key, refresh, *args, **kwargs)
+            generation, found = _read([] if refresh else [cache_key])
+            result = found.get(cache_key, sentry)
             if result is sentry:
-                result = func(*args, **kwargs)
-                if not store_result:
-                    # Then the result isn't valuable/important to store but
-                    # we want to store something. Just to remember that
-                    # it has be done.
-                    cache.set(cache_key, True, timeout)
-                else:
-                    cache.set(cache_key, result, timeout)
-                if miss_callable:
-                    miss_callable(*args, **kwargs)
-            elif hit_callable:
-                hit_callable(*args, **kwargs)
+                result = _compute(cache_key, generation, *args, **kwargs)
+            else:
+                if local:
+                    _local_set(cache_key, result)
+                if hit_callable:
+                    hit_callable(*args, **kwargs)
             return result
 
+        def get_many(instances):
+            """Results for a list of single argument calls, using a single
+            round trip to the cache. Only missing results are computed."""
+            instances = list(instances)
+            sentry = object()
+            results = [sentry] * len(instances)
+            keys = {}
+            for index, instance in enumerate(instances):
+                result = _get_prefetched([instance], {}, sentry)
+                if result is sentry:
+                    cache_key = _make_cache_key(instance)
+                    if tagged:
+                        add_tags(entry_tag(cache_key))
+                    if local:
+                        result = _local_get(cache_key, sentry)
+                    if result is sentry:
+                        keys.setdefault(cache_key, []).append(index)
+                results[index] = result
+
+            generation, found = _read(keys) if keys else (None, {})
+            missing = {}
+            missing_tags = {}
+            for cache_key, indexes in keys.items():
+                if cache_key in found:
+                    result = found[cache_key]
+                    if lock_timeout is not None:
+                        result, expires, duration = result
+                    if lock_timeout is None or _is_fresh(expires, duration):
+                        if local:
+                            _local_set(cache_key, result)
+                        if hit_callable:
+                            hit_callable(instances[indexes[0]])
+                    else:
+                        # one caller refreshes, others are served stale
+                        result = _protected(
+                            cache_key, False, instances[indexes[0]]
+                        )
+                else:
+                    instance = instances[indexes[0]]
+                    t0 = time.time()
+                    if tagged:
+                        with collect_tags(merge=False) as tags:
+                            result = func(instance)
+                        missing_tags[cache_key] = tags
+                    else:
+                        result = func(instance)
+                    missing[cache_key] = _make_entry(result, time.time() - t0)
+                    if local:
+                        _local_set(cache_key, result)
+                    if miss_callable:
+                        miss_callable(instance)
+                for index in indexes:
+                    results[index] = result
+
+            by_timeout = {}
+            for cache_key, (value, ttl) in missing.items():
+                by_timeout.setdefault(ttl, {})[cache_key] = (generation, value)
+            for ttl, values in by_timeout.items():
+                cache.set_many(values, ttl)
+            for cache_key, tags in missing_tags.items():
+                cache_tags.tag(cache_key, tags, missing[cache_key][1])
+
+            if is_method:
+                for instance, result in zip(instances, results):
+                    _set_prefetched(instance, result)
+            return results
+
         def invalidate(*args, **kwargs):
             cache_key = _make_cache_key(*args, **kwargs)
             cache.delete(cache_key)
+            if local:
+                # other processes drop all their local results
+                _bump(_make_invalidations_key())
+                local.clear()
+                versions.clear()
 
         def invalidate_all():
-            keys = cache.keys(f'{_make_prefix()}*')
-            for cache_key in keys:
-                cache.delete(cache_key)
-            return keys
+            """Move to a new generation. Old results are never read again."""
+            generation = _bump(_make_generation_key())
+            if local:
+                local.clear()
+                versions.clear()
+            return generation
 
+        inner.get_many = get_many
         inner.invalidate = invalidate
         inner.invalidate_all = invalidate_all
         return inner
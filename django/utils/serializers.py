@@ -1,6 +1,7 @@
 import json
 import re
 
+from django.db import models
 from rest_framework import exceptions, serializers
 
 from apps.photo.cropping.boundingbox import CropBox
@@ -59,3 +60,37 @@ class CropBoxField(serializers.Field):
             return CropBox(**data)
         except (Exception) as err:
             raise exceptions.ValidationError(str(err)) from err
+
+
+def prefetch_memoized(instances, path):
+    """Resolve a memoized method for all instances with a single cache
+    lookup. `path` is a dotted path to the method, and can follow related
+    objects and managers. Example: 'byline_set.contributor.thumb'"""
+    *attributes, method_name = path.split('.')
+    for attribute in attributes:
+        related = []
+        for instance in instances:
+            value = getattr(instance, attribute, None)
+            if isinstance(value, models.Manager):
+                related.extend(value.all())
+            elif value is not None:
+                related.append(value)
+        instances = related
+    by_class = {}
+    for instance in instances:
+        by_class.setdefault(type(instance), []).append(instance)
+    for cls, group in by_class.items():
+        getattr(cls, method_name).get_many(group)
+
+
+class MemoizedListSerializer(serializers.ListSerializer):
+    """ListSerializer that prefetches memoized methods listed in the child
+    serializer's `Meta.prefetch_memoized`, so that a list makes one cache
+    lookup per method instead of one per item."""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        instances = list(iterable)
+        for path in getattr(self.child.Meta, 'prefetch_memoized', []):
+            prefetch_memoized(instances, path)
+        return super().to_representation(instances)
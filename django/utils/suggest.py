@@ -0,0 +1,96 @@
+"""Prefix suggestions for typeahead search, from redis sorted sets"""
+
+import json
+import unicodedata
+
+from django_redis import get_redis_connection
+
+SEPARATOR = '\x00'
+
+
+def normalize(text):
+    """Lower case text without accents or punctuation"""
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in text).split())
+
+
+class SuggestIndex:
+    """Prefix index of short texts, such as headlines or names.
+
+    Every word suffix of the text is a member of a sorted set where all
+    scores are zero, so a prefix lookup is a single ZRANGEBYLEX. Items are
+    replaced or removed one at a time, which keeps the index up to date
+    without rebuilding it.
+    """
+
+    def __init__(self, name, term_length=40, connection=None):
+        self.name = name
+        self.key = f'suggest:{name}'
+        self.data_key = f'{self.key}:data'
+        self.terms_key = f'{self.key}:terms'
+        self.term_length = term_length
+        self._connection = connection
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = get_redis_connection()
+        return self._connection
+
+    def _terms(self, pk, text):
+        words = normalize(text).split()
+        terms = {
+            ' '.join(words[n:])[:self.term_length]
+            for n in range(len(words))
+        }
+        return [f'{term}{SEPARATOR}{pk}' for term in terms]
+
+    def _remove(self, pipe, pk, old_terms):
+        if old_terms:
+            pipe.zrem(self.key, *json.loads(old_terms))
+        pipe.hdel(self.terms_key, pk)
+        pipe.hdel(self.data_key, pk)
+
+    def add(self, pk, text, data):
+        """Add or replace item in index. `data` is returned in suggestions."""
+        old_terms = self.connection.hget(self.terms_key, pk)
+        terms = self._terms(pk, text)
+        pipe = self.connection.pipeline()
+        self._remove(pipe, pk, old_terms)
+        if terms:
+            pipe.zadd(self.key, {term: 0 for term in terms})
+            pipe.hset(self.terms_key, pk, json.dumps(terms))
+            pipe.hset(self.data_key, pk, json.dumps(data))
+        pipe.execute()
+
+    def remove(self, pk):
+        old_terms = self.connection.hget(self.terms_key, pk)
+        pipe = self.connection.pipeline()
+        self._remove(pipe, pk, old_terms)
+        pipe.execute()
+
+    def clear(self):
+        self.connection.delete(self.key, self.terms_key, self.data_key)
+
+    def suggest(self, prefix, limit=10):
+        """Data of items with a word starting with prefix"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        low = b'[' + prefix.encode()
+        members = self.connection.zrangebylex(
+            self.key, low, low + b'\xff', start=0, num=limit * 4
+        )
+        pks = []
+        for member in members:
+            pk = member.decode().rsplit(SEPARATOR, 1)[-1]
+            if pk not in pks:
+                pks.append(pk)
+        pks = pks[:limit]
+        if not pks:
+            return []
+        return [
+            json.loads(data)
+            for data in self.connection.hmget(self.data_key, pks) if data
+        ]
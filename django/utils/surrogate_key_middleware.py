@@ -0,0 +1,48 @@
+from apps.core.nginx_cache import (
+    NGINX_CACHE_TIMEOUT,
+    SURROGATE_KEY,
+    UNCACHED_PATHS,
+    surrogate_keys,
+    surrogate_urls,
+)
+
+from .cache_tags import collect_tags
+
+
+class SurrogateKeyMiddleware:
+    """Tag responses to anonymous users with the model instances they
+    include, so they can be cached by nginx and purged when those change.
+    Views can set the `Surrogate-Key` header themselves, and an empty value
+    means that the response should not be cached."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        with collect_tags() as tags:
+            response = self.get_response(request)
+        if not self.cacheable(request, response):
+            return response
+        timeout = NGINX_CACHE_TIMEOUT
+        if SURROGATE_KEY not in response:
+            keys, timeout = surrogate_keys(tags)
+            response[SURROGATE_KEY] = keys
+        response.setdefault('X-Accel-Expires', timeout)
+        keys = response[SURROGATE_KEY].split()
+        timeout = int(response['X-Accel-Expires'])
+        if keys and timeout:
+            surrogate_urls.add(request.build_absolute_uri(), keys)
+        else:
+            response['X-Accel-Expires'] = 0
+        return response
+
+    @staticmethod
+    def cacheable(request, response):
+        return (
+            response.status_code == 200 and not response.streaming
+            and not response.cookies and request.user.is_anonymous
+            and 'HTTP_AUTHORIZATION' not in request.META
+            and not request.path.startswith(UNCACHED_PATHS)
+        )
@@ -0,0 +1,15 @@
+import time
+
+from utils.bloom import RotatingBloomFilter
+
+
+def test_rotating_bloom_filter():
+    bloom = RotatingBloomFilter(name=f'test:{time.time()}', window=300)
+    now = time.time()
+    assert bloom.add('foo', when=now) is False
+    assert bloom.add('foo', when=now) is True
+    assert bloom.add('bar', when=now) is False
+    # remembered in the next window
+    assert bloom.add('foo', when=now + 300) is True
+    # but forgotten after two windows
+    assert bloom.add('bar', when=now + 600) is False
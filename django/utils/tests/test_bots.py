@@ -0,0 +1,33 @@
+import pytest
+
+from utils.bots import BOT_PATTERN, is_bot, load_signatures
+
+browsers = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/77.0.3865.90 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 13_1 like Mac OS X) '
+    'AppleWebKit/605.1.15 (KHTML, like Gecko) Version/13.0 Mobile/15E148',
+]
+bots = [
+    'Mozilla/5.0 (compatible; Googlebot/2.1; '
+    '+http://www.google.com/bot.html)',
+    'Mozilla/5.0 (compatible; SemrushBot/6~bl; +http://www.semrush.com)',
+    'facebookexternalhit/1.1',
+    'Feedly/1.0 (+http://www.feedly.com/fetcher.html)',
+    '',
+]
+
+
+@pytest.mark.parametrize('user_agent', browsers)
+def test_browser_is_not_bot(user_agent):
+    assert not is_bot(user_agent)
+
+
+@pytest.mark.parametrize('user_agent', bots)
+def test_bot_is_bot(user_agent):
+    assert is_bot(user_agent)
+
+
+def test_all_signatures_match():
+    for signature in load_signatures():
+        assert BOT_PATTERN.search(f'Mozilla/5.0 ({signature})')
@@ -0,0 +1,21 @@
+from django.core.cache import cache
+
+from utils.cache_lock import CacheLock
+
+
+def test_cache_lock_is_released_by_owner_only():
+    cache.delete('test_lock')
+    first, second = CacheLock('test_lock', 10), CacheLock('test_lock', 10)
+    with first as acquired:
+        assert acquired
+        assert not second.acquire()
+        assert not second.release()
+        assert cache.ttl('test_lock') <= 10
+
+    # the lock expired and was taken by someone else
+    assert first.acquire()
+    cache.delete('test_lock')
+    assert second.acquire()
+    assert not first.release()
+    assert not CacheLock('test_lock', 10).acquire()
+    assert second.release()
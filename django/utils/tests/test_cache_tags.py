@@ -0,0 +1,108 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+import pytest
+
+from apps.stories.models import Section
+from utils.cache_tags import (
+    add_tags,
+    cache_tags,
+    collect_tags,
+    entry_tag,
+    instance_tag,
+    model_tag,
+    track_models,
+)
+from utils.decorators import cache_memoize
+
+
+def test_collect_tags():
+    add_tags('ignored')
+    with collect_tags() as outer:
+        add_tags('a')
+        with collect_tags() as inner:
+            add_tags('b')
+        with collect_tags(merge=False) as isolated:
+            add_tags('c')
+    assert inner == {'b'}
+    assert isolated == {'c'}
+    assert outer == {'a', 'b'}
+
+
+def test_purge_tagged_entries():
+    tag = f'test:{time.time()}'
+    cache_tags.set('payload', 1, 60, [tag])
+    cache_tags.set('page', 2, 60, [entry_tag('payload')])
+    cache_tags.set('other', 3, 60, [f'{tag}:other'])
+    assert cache_tags.purge(tag) == 2
+    assert cache.get_many(['payload', 'page', 'other']) == {'other': 3}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_tracked_models():
+    track_models(Section)
+    section = Section.objects.create(title='Nyheter')
+    calls = []
+
+    @cache_memoize(60, tagged=True)
+    def section_titles():
+        calls.append(1)
+        add_tags(model_tag(Section))
+        return sorted(item.title for item in Section.objects.all())
+
+    section_titles.invalidate_all()
+    with collect_tags() as tags:
+        assert section_titles() == ['Nyheter']
+    # depends on the cached entry, not on what was used to compute it
+    assert len(tags) == 1
+    assert instance_tag(section) not in tags
+    section_titles()
+    assert len(calls) == 1
+
+    Section.objects.get(pk=section.pk).save()
+    section_titles()
+    assert len(calls) == 2
+
+    Section.objects.create(title='Kultur')
+    assert section_titles() == ['Kultur', 'Nyheter']
+    assert len(calls) == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_purge_after_commit():
+    track_models(Section)
+    section = Section.objects.create(title='Nyheter')
+    cache_tags.set('section', 1, 60, [instance_tag(section)])
+    with transaction.atomic():
+        section.save()
+        # concurrent requests would cache the old data again
+        assert cache.get('section') == 1
+    assert cache.get('section') is None
+
+
+class Tagged:
+    calls = []
+
+    def __init__(self, pk):
+        self.pk = pk
+        self.modified = 'today'
+
+    @cache_memoize(60, tagged=True)
+    def label(self):
+        self.calls.append(self.pk)
+        add_tags(f'test:tagged:{self.pk}')
+        return f'label {self.pk}'
+
+
+def test_get_many_is_tagged():
+    Tagged.label.invalidate_all()
+    with collect_tags() as tags:
+        Tagged.label.get_many([Tagged(1), Tagged(2)])
+    assert len(tags) == 2
+    assert 'test:tagged:1' not in tags
+
+    cache_tags.purge('test:tagged:1')
+    Tagged.calls.clear()
+    Tagged.label.get_many([Tagged(1), Tagged(2)])
+    assert Tagged.calls == [1]
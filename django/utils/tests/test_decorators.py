@@ -0,0 +1,270 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from django.core.cache import cache
+
+from utils import decorators
+from utils.decorators import cache_memoize
+
+
+def test_cache_memoize_invalidate_all():
+    calls = []
+
+    @cache_memoize(60)
+    def shout(word):
+        calls.append(word)
+        return word.upper()
+
+    shout.invalidate_all()
+    assert shout('foo') == 'FOO'
+    assert shout('foo') == 'FOO'
+    assert shout('bar') == 'BAR'
+    assert calls == ['foo', 'bar']
+
+    shout.invalidate('foo')
+    assert shout('foo') == 'FOO'
+    assert calls == ['foo', 'bar', 'foo']
+
+    generation = shout.invalidate_all()
+    assert shout.invalidate_all() == generation + 1
+    shout('foo')
+    shout('bar')
+    assert calls == ['foo', 'bar', 'foo', 'foo', 'bar']
+
+
+def test_cache_memoize_single_round_trip(monkeypatch):
+    """The generation and the result are looked up together."""
+    lookups = []
+
+    class CountingCache:
+        def __getattr__(self, name):
+            lookups.append(name)
+            return getattr(cache, name)
+
+    @cache_memoize(60)
+    def shout(word):
+        return word.upper()
+
+    shout.invalidate_all()
+    shout('foo')
+    monkeypatch.setattr(decorators, 'cache', CountingCache())
+    assert shout('foo') == 'FOO'
+    assert lookups == ['get_many']
+
+
+def test_cache_memoize_stampede_cold_cache():
+    """Concurrent callers on a cold cache wait for a single computation."""
+    calls = []
+
+    @cache_memoize(60, lock_timeout=5)
+    def slow(word):
+        calls.append(word)
+        time.sleep(0.2)
+        return word.upper()
+
+    slow.invalidate_all()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(slow, ['foo'] * 8))
+    assert results == ['FOO'] * 8
+    assert calls == ['foo']
+
+
+def test_cache_memoize_refresh_waits_for_new_result():
+    """A forced refresh is never served the result it replaces."""
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    @cache_memoize(60, lock_timeout=5)
+    def slow(word):
+        calls.append(word)
+        if len(calls) == 2:
+            started.set()
+            release.wait(5)
+        return f'{word}{len(calls)}'
+
+    slow.invalidate_all()
+    assert slow('foo') == 'foo1'
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        refreshing = pool.submit(slow, 'foo', _refresh=True)
+        assert started.wait(5)
+        threading.Timer(0.2, release.set).start()
+        # the lock is held, so this waits for the ongoing refresh
+        assert slow('foo', _refresh=True) == 'foo2'
+        assert refreshing.result() == 'foo2'
+    assert calls == ['foo', 'foo']
+
+
+def test_cache_memoize_stale_while_revalidate(monkeypatch):
+    """While one caller recomputes an expired result, others get it stale."""
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    @cache_memoize(60, lock_timeout=5, beta=0)
+    def slow(word):
+        calls.append(word)
+        if len(calls) > 1:
+            started.set()
+            release.wait(5)
+        return f'{word}{len(calls)}'
+
+    slow.invalidate_all()
+    assert slow('foo') == 'foo1'
+    assert slow('foo') == 'foo1'
+
+    # fast forward past the soft expiry, but within the stale timeout
+    now = time.time() + 61
+    monkeypatch.setattr(decorators.time, 'time', lambda: now)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        refreshing = pool.submit(slow, 'foo')
+        assert started.wait(5)
+        # other callers are not blocked by the ongoing refresh
+        assert [slow('foo') for _ in range(3)] == ['foo1'] * 3
+        release.set()
+        assert refreshing.result() == 'foo2'
+    assert len(calls) == 2
+
+
+def test_cache_memoize_early_expiry(monkeypatch):
+    """Results are refreshed probabilistically before they expire."""
+    calls = []
+
+    @cache_memoize(60, lock_timeout=5, beta=1.0)
+    def shout(word):
+        calls.append(word)
+        time.sleep(0.01)
+        return word.upper()
+
+    shout.invalidate_all()
+    shout('foo')
+    shout('foo')
+    assert calls == ['foo']
+
+    # shortly before expiry, a lucky dice roll keeps the result
+    now = time.time() + 59.9
+    monkeypatch.setattr(decorators.time, 'time', lambda: now)
+    monkeypatch.setattr(decorators.random, 'random', lambda: 0.0)
+    shout('foo')
+    assert calls == ['foo']
+
+    # while an unlucky roll refreshes it ahead of time
+    monkeypatch.setattr(decorators.random, 'random', lambda: 0.999999)
+    shout('foo')
+    assert calls == ['foo', 'foo']
+
+
+def test_cache_memoize_local_tier(monkeypatch):
+    calls = []
+
+    @cache_memoize(60, local_timeout=30)
+    def shout(word):
+        calls.append(word)
+        return word.upper()
+
+    shout.invalidate_all()
+    assert shout('foo') == 'FOO'
+
+    # local hits never touch the shared cache
+    monkeypatch.setattr(decorators, 'cache', None)
+    assert shout('foo') == 'FOO'
+    monkeypatch.undo()
+    assert calls == ['foo']
+
+    shout.invalidate('foo')
+    assert shout('foo') == 'FOO'
+    shout.invalidate_all()
+    assert shout('foo') == 'FOO'
+    assert calls == ['foo', 'foo', 'foo']
+
+
+def test_cache_memoize_local_tier_other_process(monkeypatch):
+    """Invalidation in one process drops local results in the others."""
+    monkeypatch.setattr(decorators, 'LOCAL_VERSION_TIMEOUT', 0)
+    calls = []
+
+    def shout(word):
+        calls.append(word)
+        return word.upper()
+
+    # same function in two processes
+    first = cache_memoize(60, prefix='shout', local_timeout=30)(shout)
+    second = cache_memoize(60, prefix='shout', local_timeout=30)(shout)
+    first.invalidate_all()
+    assert first('foo') == second('foo') == 'FOO'
+    assert calls == ['foo']
+
+    second.invalidate('foo')
+    assert first('foo') == 'FOO'
+    assert calls == ['foo', 'foo']
+    second.invalidate_all()
+    assert first('foo') == 'FOO'
+    assert calls == ['foo', 'foo', 'foo']
+
+
+CALLS = []
+
+
+class Thing:
+    def __init__(self, pk):
+        self.pk = pk
+        self.modified = 'today'
+
+    @cache_memoize(60)
+    def double(self):
+        CALLS.append(self.pk)
+        return self.pk * 2
+
+
+def test_cache_memoize_get_many(monkeypatch):
+    Thing.double.invalidate_all()
+    things = [Thing(n) for n in range(5)]
+    things[1].double()
+    things[3].double()
+    CALLS.clear()
+
+    assert Thing.double.get_many(things) == [0, 2, 4, 6, 8]
+    # only missing results are computed
+    assert CALLS == [0, 2, 4]
+
+    # results are attached to the instances
+    monkeypatch.setattr(decorators, 'cache', None)
+    assert [thing.double() for thing in things] == [0, 2, 4, 6, 8]
+    monkeypatch.undo()
+
+    # fresh instances find all the results in the cache
+    CALLS.clear()
+    assert Thing.double.get_many(Thing(n) for n in range(5)) == [0, 2, 4, 6, 8]
+    assert CALLS == []
+
+
+class Stale:
+    def __init__(self, pk):
+        self.pk = pk
+        self.modified = 'today'
+
+    @cache_memoize(60, lock_timeout=5)
+    def double(self):
+        CALLS.append(self.pk)
+        return self.pk * 2
+
+
+def test_cache_memoize_get_many_refreshes_stale(monkeypatch):
+    Stale.double.invalidate_all()
+    Stale.double.get_many([Stale(1), Stale(2)])
+    CALLS.clear()
+
+    # fresh results are served from the cache
+    assert Stale.double.get_many([Stale(1), Stale(2)]) == [2, 4]
+    assert CALLS == []
+
+    # expired results are refreshed
+    now = time.time() + 61
+    monkeypatch.setattr(decorators.time, 'time', lambda: now)
+    assert Stale.double.get_many([Stale(1), Stale(2)]) == [2, 4]
+    assert CALLS == [1, 2]
+    CALLS.clear()
+    assert Stale.double.get_many([Stale(1), Stale(2)]) == [2, 4]
+    assert CALLS == []
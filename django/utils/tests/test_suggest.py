@@ -0,0 +1,28 @@
+import time
+
+from utils.suggest import SuggestIndex, normalize
+
+
+def test_normalize():
+    assert normalize(' Nye  STUDENTER, på Blindern!') == (
+        'nye studenter pa blindern'
+    )
+
+
+def test_suggest_index():
+    index = SuggestIndex(name=f'test:{time.time()}')
+    index.add(1, 'Nye studenter på Blindern', {'id': 1})
+    index.add(2, 'Studentsamskipnaden øker husleia', {'id': 2})
+    assert index.suggest('stud') == [{'id': 1}, {'id': 2}]
+    assert index.suggest('Blind') == [{'id': 1}]
+    assert index.suggest('studenter p') == [{'id': 1}]
+    assert index.suggest('') == []
+
+    # replaced items are not found by their old text
+    index.add(1, 'Gamle nyheter', {'id': 1})
+    assert index.suggest('stud') == [{'id': 2}]
+    assert index.suggest('nyhet') == [{'id': 1}]
+
+    index.remove(2)
+    assert index.suggest('stud') == []
+    index.clear()
@@ -0,0 +1,40 @@
+// Most read stories. Only fetched in the browser, and deliberately left out
+// of the server render, since rendered pages are cached for up to a day.
+const sliceLens = R.lensProp('mostRead')
+
+// Selectors
+export const getMostRead = R.view(sliceLens)
+
+// Actions
+export const MOST_READ_REQUESTED = 'mostread/MOST_READ_REQUESTED'
+export const mostReadRequested = (window = '24h') => ({
+  type: MOST_READ_REQUESTED,
+  payload: { window },
+})
+
+export const MOST_READ_FETCHED = 'mostread/MOST_READ_FETCHED'
+export const mostReadFetched = ({ window, results }) => ({
+  type: MOST_READ_FETCHED,
+  payload: { window, results },
+})
+
+// Reducer
+const initialState = { fetching: false, window: '24h', results: [] }
+const getReducer = ({ type, payload, error }) => {
+  switch (type) {
+    case MOST_READ_REQUESTED:
+      return R.compose(
+        R.assoc('fetching', true),
+        R.merge(payload),
+      )
+    case MOST_READ_FETCHED:
+      return R.compose(
+        R.assoc('fetching', false),
+        R.merge(payload),
+      )
+    default:
+      return R.identity
+  }
+}
+
+export default (state = initialState, action) => getReducer(action)(state)
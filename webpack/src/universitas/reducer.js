@@ -3,5 +3,6 @@ import site from 'ducks/site'
 import issues from 'ducks/issues'
 import publicstory from 'ducks/publicstory'
 import adverts from 'ducks/adverts'
+import mostRead from 'ducks/mostRead'
 import { reducer as auth } from 'ducks/auth'
-export default { newsFeed, site, publicstory, issues, auth, adverts }
+export default { newsFeed, site, publicstory, issues, auth, adverts, mostRead }
@@ -20,6 +20,11 @@ import {
 } from 'ducks/publicstory'
 import { SITE_REQUESTED, siteFetched } from 'ducks/site'
 import { ISSUES_REQUESTED, issuesFetched } from 'ducks/issues'
+import {
+  MOST_READ_REQUESTED,
+  mostReadRequested,
+  mostReadFetched,
+} from 'ducks/mostRead'
 import {
   FEED_REQUESTED,
   SEARCH,
@@ -36,9 +41,11 @@ const routeAction = R.propSatisfies(R.test(/^router/), 'type')
 
 export default function* rootSaga() {
   yield fork(pageView) // initial page view for analytics
+  yield fork(initialMostRead) // not included in cached server render
   yield takeLatest(FEED_REQUESTED, fetchFeed)
   yield takeLatest(SITE_REQUESTED, fetchSite)
   yield takeLatest(ISSUES_REQUESTED, fetchIssues)
+  yield takeLatest(MOST_READ_REQUESTED, fetchMostRead)
   yield takeLatest(SEARCH, fetchSearch)
   yield takeEvery(STORY_REQUESTED, fetchStory)
   yield takeEvery(STORIES_REQUESTED, fetchStories)
@@ -115,6 +122,16 @@ function* fetchIssues(action) {
   else yield call(handleError, error)
 }
 
+function* initialMostRead() {
+  if (global.document) yield put(mostReadRequested())
+}
+
+function* fetchMostRead(action) {
+  const { response, error } = yield call(apiList, 'mostread', action.payload)
+  if (response) yield put(mostReadFetched(response))
+  else yield call(handleError, error)
+}
+
 const googleAnalyticsPageView = action => {
   // register a new page view with google analytics
   const document = global.document